@@ -0,0 +1,70 @@
+"""Read/write benchmark for the snapshot codecs.
+
+    python bench/codec_bench.py [--site brand_a] [--repeat 5]
+
+Uses the latest snapshot of a site from docs/data/snapshots as the payload and
+reports size on disk, write time, full-load time and the peak Python memory of
+a full load vs. a streaming pass (tracemalloc).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from codec import CODECS, get_codec  # noqa: E402
+from storage import canonical_products, load_latest_snapshot  # noqa: E402
+
+SNAP_DIR = os.path.join(ROOT, "docs", "data", "snapshots")
+
+
+def _timed(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) * 1000.0 / repeat
+
+
+def _peak(fn):
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--site", default="brand_a")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    snap = load_latest_snapshot(SNAP_DIR, args.site)
+    if not snap:
+        sys.exit(f"no snapshots for {args.site}")
+    products = canonical_products(snap["products"])
+    print(f"payload: {args.site}, {len(products)} products, repeat={args.repeat}")
+    print(f"{'codec':<10} {'bytes':>10} {'write ms':>9} {'load ms':>8} {'load peak':>10} {'stream peak':>12}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in CODECS:
+            try:
+                codec = get_codec(name)
+            except RuntimeError as e:
+                print(f"{name:<10} skipped ({e})")
+                continue
+            path = os.path.join(tmp, "payload" + codec.ext)
+            write_ms = _timed(lambda: codec.write(path, products), args.repeat)
+            load_ms = _timed(lambda: list(codec.iter(path)), args.repeat)
+            load_peak = _peak(lambda: list(codec.iter(path)))
+            stream_peak = _peak(lambda: sum(1 for _ in codec.iter(path)))
+            print(f"{name:<10} {os.path.getsize(path):>10} {write_ms:>9.1f} {load_ms:>8.1f} "
+                  f"{load_peak / 1024:>8.0f}KB {stream_peak / 1024:>10.0f}KB")
+
+
+if __name__ == "__main__":
+    main()
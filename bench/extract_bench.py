@@ -0,0 +1,98 @@
+"""Benchmark generic product-page extraction on a saved corpus.
+
+    python bench/extract_bench.py [corpus_dir] [--repeat N]
+
+corpus_dir holds saved product pages (*.html) plus an expected.json that maps
+file name -> expected {min_price, max_price, currency, available, sku}.
+Compares the structured extractor (extract_product) with the legacy
+"BeautifulSoup + og meta + PRICE_RE over page text" path.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from bs4 import BeautifulSoup  # noqa: E402
+from fetchers.generic import PRICE_RE, extract_product  # noqa: E402
+
+FIELDS = ["min_price", "max_price", "currency", "available", "sku"]
+
+
+def legacy_extract(html):
+    ps = BeautifulSoup(html, "lxml")
+    title = (ps.select_one("meta[property='og:title']") or ps.select_one("title"))
+    title_text = title.get("content").strip() if title and title.has_attr("content") else (title.text.strip() if title else "")
+    price = None
+    ogp = ps.select_one("meta[property='product:price:amount']")
+    if ogp and ogp.get("content"):
+        try:
+            price = float(ogp["content"])
+        except Exception:
+            pass
+    if price is None:
+        m = PRICE_RE.search(ps.get_text(" ", strip=True))
+        if m:
+            try:
+                price = float(m.group(1).replace(",", ""))
+            except Exception:
+                pass
+    return {"title": title_text, "min_price": price, "max_price": price,
+            "currency": None, "available": None, "sku": None}
+
+
+def run(fn, pages, repeat):
+    out = {}
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for name, html in pages.items():
+            out[name] = fn(html)
+    elapsed = time.perf_counter() - t0
+    return out, elapsed * 1000.0 / (repeat * len(pages))
+
+
+def score(results, expected):
+    price_ok = 0
+    field_ok = 0
+    for name, exp in expected.items():
+        got = results.get(name) or {}
+        if got.get("min_price") == exp.get("min_price"):
+            price_ok += 1
+        field_ok += sum(1 for k in FIELDS if got.get(k) == exp.get(k))
+    n = len(expected)
+    return price_ok / n, field_ok / (n * len(FIELDS))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("corpus", nargs="?", default=os.path.join(ROOT, "bench", "corpus", "extract"))
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    with open(os.path.join(args.corpus, "expected.json"), "r", encoding="utf-8") as f:
+        expected = json.load(f)
+    pages = {}
+    for name in expected:
+        with open(os.path.join(args.corpus, name), "r", encoding="utf-8") as f:
+            pages[name] = f.read()
+
+    print(f"corpus: {len(pages)} pages, repeat={args.repeat}")
+    print(f"{'extractor':<12} {'ms/page':>8} {'price acc':>10} {'field acc':>10}")
+    for label, fn in (("legacy", legacy_extract), ("structured", extract_product)):
+        results, ms = run(fn, pages, args.repeat)
+        price_acc, field_acc = score(results, expected)
+        print(f"{label:<12} {ms:>8.2f} {price_acc:>10.0%} {field_acc:>10.0%}")
+
+    results, _ = run(extract_product, pages, 1)
+    for name, exp in expected.items():
+        got = results[name]
+        bad = [k for k in FIELDS if got.get(k) != exp.get(k)]
+        if bad:
+            print(f"  mismatch {name} [{got.get('source')}]: " + ", ".join(f"{k}={got.get(k)!r} (want {exp.get(k)!r})" for k in bad))
+
+
+if __name__ == "__main__":
+    main()
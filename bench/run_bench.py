@@ -0,0 +1,176 @@
+"""End-to-end benchmark of run_once against local stand-in storefronts.
+
+    python bench/run_bench.py [--sites 3] [--generic-sites 1] [--skus 800]
+                              [--variants 3] [--runs 3] [--churn 0.05]
+                              [--latency-ms 20] [--error-rate 0.0] [--throttle-rate 0.0]
+                              [--rate 8] [--order newest manual random]
+                              [--profile] [--json out.json]
+
+Every site gets a synthetic catalog (bench/synth.py) served by its own
+stand-in server (bench/standin.py) on 127.0.0.<n>, so per-host limits apply
+as with real storefronts. Shopify sites serve products.json; generic sites
+only serve HTML and go through the generic fetcher. The catalogs are churned
+between runs. All output (snapshots, history, journal, HTTP cache) goes to a
+temp directory; docs/data is never touched.
+
+--order sets how the stand-ins sort their listings (see bench/standin.py).
+"newest" flatters the incremental crawl, which stops at the first page older
+than the last run; "manual" and "random" show what it costs when a store
+sorts otherwise. Several orders are benchmarked one after another, each from
+a cold start, and reported separately.
+
+Per run it reports wall time, requests seen by the servers (and 304s / injected
+errors), client-side p95 latency, peak RSS of the process so far, and the
+per-stage times run_once records in metrics_latest.json (see src/metrics.py), summed
+over sites.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+import run  # noqa: E402
+from standin import ORDERS, StandinStore, serve  # noqa: E402
+from synth import CATEGORIES, churn, make_catalog  # noqa: E402
+
+
+def _stages(record):
+    """Site stages summed over the crawled sites, then the run-level ones."""
+    out = {}
+    for m in record["sites"].values():
+        for stage, sec in m["stages"].items():
+            out[stage] = out.get(stage, 0.0) + sec
+    for stage, sec in record["stages"].items():
+        if stage != "crawl":
+            out[stage] = out.get(stage, 0.0) + sec
+    return {k: round(v, 3) for k, v in out.items()}
+
+
+def _site_cfg(i, srv, mode):
+    return {
+        "id": f"bench_{mode}_{i}",
+        "name": f"Bench {mode} {i}",
+        "base_url": srv.url,
+        "currency_symbol": "€",
+        "currency_code": "EUR",
+        "categories": [
+            {"label": c, "url": f"{srv.url}/collections/{c.lower()}"} for c in CATEGORIES
+        ],
+    }
+
+
+def _config(args, sites):
+    cfg = run.load_config()
+    cfg["sites"] = sites
+    cfg.setdefault("schedule", {})["max_products_per_site"] = args.skus * 2
+    if args.rate is not None:
+        cfg.setdefault("http", {})["rate_per_sec"] = args.rate
+    return cfg
+
+
+def _point_run_at(tmp, cfg):
+    run.ROOT = tmp
+    run.DOCS_DATA = os.path.join(tmp, "docs", "data")
+    run.SNAP_DIR = os.path.join(run.DOCS_DATA, "snapshots")
+    run.HISTORY_DB = os.path.join(tmp, ".cache", "history.sqlite")
+    run.JOURNAL_DIR = os.path.join(run.DOCS_DATA, "journal")
+    run.load_config = lambda: cfg
+
+
+def _next_second():
+    # run ids have one-second resolution; never let two runs share one
+    time.sleep(1.0 - datetime.now(timezone.utc).microsecond / 1e6 + 0.01)
+
+
+def _bench(args, order):
+    stores, servers, sites = [], [], []
+    for i in range(args.sites + args.generic_sites):
+        mode = "shopify" if i < args.sites else "generic"
+        store = StandinStore(make_catalog(args.skus, variants=args.variants, seed=i), mode=mode,
+                             latency_ms=args.latency_ms, error_rate=args.error_rate,
+                             throttle_rate=args.throttle_rate, seed=i, order=order)
+        srv = serve(store, host=f"127.0.0.{i + 1}")
+        stores.append(store)
+        servers.append(srv)
+        sites.append(_site_cfg(i, srv, mode))
+
+    results = []
+    print(f"order={order}")
+    print(f"{'run':>3} {'wall s':>7} {'reqs':>6} {'304':>5} {'5xx':>4} {'429':>4} {'p95 ms':>7} {'rss MB':>7}  stages (s, summed over sites)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _point_run_at(tmp, _config(args, sites))
+        for n in range(args.runs):
+            if n:
+                for i, store in enumerate(stores):
+                    store.set_catalog(churn(store.catalog, args.churn, seed=n * 1000 + i))
+                _next_second()
+            before = [s.counters() for s in stores]
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                run.run_once(force=True, profile=args.profile)
+            wall = time.perf_counter() - t0
+            after = [s.counters() for s in stores]
+            served = {k: sum(a[k] - b[k] for a, b in zip(after, before)) for k in after[0]}
+            with open(os.path.join(run.DOCS_DATA, "metrics_latest.json"), "r", encoding="utf-8") as f:
+                record = json.load(f)[-1]
+            r = {
+                "order": order,
+                "run": n + 1,
+                "wall_s": round(wall, 3),
+                "server": served,
+                "http": record["http"],
+                "peak_rss_mb": record["peak_rss_mb"],
+                "stages_s": _stages(record),
+                "sites": record["sites"],
+            }
+            results.append(r)
+            stages = " ".join(f"{s}={v:.2f}" for s, v in r["stages_s"].items())
+            print(f"{r['run']:>3} {wall:>7.2f} {served['requests']:>6} {served['not_modified']:>5} "
+                  f"{served['errors']:>4} {served['throttled']:>4} {r['http']['p95_ms'] or 0:>7.1f} {r['peak_rss_mb'] or 0:>7.1f}  {stages}")
+
+    for srv in servers:
+        srv.shutdown()
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sites", type=int, default=3, help="Shopify stand-ins")
+    ap.add_argument("--generic-sites", type=int, default=1, help="HTML-only stand-ins")
+    ap.add_argument("--skus", type=int, default=800, help="products per site")
+    ap.add_argument("--variants", type=int, default=3)
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--churn", type=float, default=0.05, help="share of products changed between runs")
+    ap.add_argument("--latency-ms", type=float, default=20)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered 429")
+    ap.add_argument("--rate", type=float, default=None, help="override http.rate_per_sec (0 = unlimited)")
+    ap.add_argument("--order", nargs="+", choices=ORDERS, default=["newest"],
+                    help="listing order(s) of the stand-ins; each is benchmarked separately")
+    ap.add_argument("--profile", action="store_true", help="run_once(profile=True); profiles stay in the temp dir")
+    ap.add_argument("--json", help="also write the results to this file")
+    args = ap.parse_args()
+
+    print(f"sites: {args.sites} shopify + {args.generic_sites} generic, {args.skus} skus x "
+          f"{args.variants} variants, churn={args.churn}, latency={args.latency_ms}ms, errors={args.error_rate}, 429s={args.throttle_rate}")
+    results = []
+    for order in args.order:
+        results.extend(_bench(args, order))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "runs": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
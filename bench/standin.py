@@ -0,0 +1,185 @@
+"""Local stand-in storefront for the benchmark.
+
+One StandinStore per fake site; serve() binds it to its own loopback
+address so the crawler's per-host limits behave as with real sites.
+
+Shopify mode serves
+  /collections/{handle}/products.json?limit=&page=
+  /products.json?limit=&page=
+  /collections/bestsellers/products.json
+with ETag / If-None-Match. Generic mode serves HTML instead:
+  /collections/{handle}             listing with links to /products/{handle}
+  /products/{handle}                product page with JSON-LD
+and 404s every *.json path, so the watcher falls back to the generic fetcher.
+Any request can be failed with a 500 (error_rate) or a 429 carrying
+Retry-After: 1 (throttle_rate).
+
+Listings come in `order`: "newest" (updated_at descending, Shopify's
+default and the best case for the incremental crawl's early exit), "manual"
+(catalog order, new products appended, as in a hand-sorted collection) or
+"random" (a fixed shuffle per handle, so pages stay stable across requests).
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+ORDERS = ("newest", "manual", "random")
+
+
+class StandinStore:
+    def __init__(self, catalog, mode="shopify", latency_ms=0, error_rate=0.0, throttle_rate=0.0, seed=0,
+                 order="newest"):
+        if order not in ORDERS:
+            raise ValueError(f"Unknown listing order: {order!r} (known: {', '.join(ORDERS)})")
+        self.catalog = catalog
+        self.mode = mode
+        self.order = order
+        self.seed = seed
+        self.latency = float(latency_ms) / 1000.0
+        self.error_rate = float(error_rate)
+        self.throttle_rate = float(throttle_rate)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+        self.errors = 0
+        self.throttled = 0
+
+    def set_catalog(self, catalog):
+        with self._lock:
+            self.catalog = catalog
+
+    def counters(self):
+        with self._lock:
+            return {"requests": self.requests, "not_modified": self.not_modified, "errors": self.errors,
+                    "throttled": self.throttled}
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _fault(self):
+        """None, 500 or 429 for the next request, drawn from the injected rates."""
+        with self._lock:
+            x = self._rng.random()
+        if x < self.error_rate:
+            return 500
+        if x < self.error_rate + self.throttle_rate:
+            return 429
+        return None
+
+    def _listing(self, handle):
+        items = self.catalog if handle is None else [p for p in self.catalog if p["collection"] == handle]
+        if self.order == "newest":
+            return sorted(items, key=lambda p: p["updated_at"], reverse=True)
+        if self.order == "random":
+            return sorted(items, key=lambda p: hashlib.sha1(f"{self.seed}:{p['handle']}".encode()).digest())
+        return list(items)
+
+    def products_json(self, handle, query):
+        if handle == "bestsellers":
+            items = self.catalog[: int(query.get("limit", ["20"])[0])]
+            return {"products": items}
+        limit = int(query.get("limit", ["30"])[0])
+        page = int(query.get("page", ["1"])[0])
+        items = self._listing(handle)
+        if handle is not None and not items:
+            return None
+        return {"products": items[(page - 1) * limit: page * limit]}
+
+    def listing_html(self, handle):
+        links = "".join(
+            f'<li><a href="/products/{p["handle"]}">{p["title"]}</a></li>' for p in self._listing(handle)
+        )
+        return f"<html><head><title>{handle}</title></head><body><ul>{links}</ul></body></html>"
+
+    def product_html(self, handle):
+        p = next((x for x in self.catalog if x["handle"] == handle), None)
+        if p is None:
+            return None
+        offers = [
+            {"@type": "Offer", "price": v["price"], "priceCurrency": "EUR",
+             "availability": "https://schema.org/" + ("InStock" if v["available"] else "OutOfStock")}
+            for v in p["variants"]
+        ]
+        ld = {"@context": "https://schema.org", "@type": "Product", "name": p["title"],
+              "sku": str(p["id"]), "offers": offers}
+        filler = "<p>Lorem ipsum dolor sit amet.</p>" * 40
+        return (f'<html><head><title>{p["title"]}</title>'
+                f'<script type="application/ld+json">{json.dumps(ld)}</script></head>'
+                f'<body><h1>{p["title"]}</h1>{filler}</body></html>')
+
+
+def _handler(store):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body=b"", ctype="application/json", etag=None, retry_after=None):
+            self.send_response(status)
+            if etag:
+                self.send_header("ETag", etag)
+            if retry_after is not None:
+                self.send_header("Retry-After", str(retry_after))
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def do_GET(self):
+            store._count("requests")
+            if store.latency:
+                time.sleep(store.latency)
+            fault = store._fault()
+            if fault == 500:
+                store._count("errors")
+                return self._send(500, b"{}")
+            if fault == 429:
+                store._count("throttled")
+                return self._send(429, b"{}", retry_after=1)
+            u = urlparse(self.path)
+            parts = u.path.strip("/").split("/")
+            query = parse_qs(u.query)
+
+            if u.path.endswith(".json"):
+                if store.mode != "shopify":
+                    return self._send(404, b"{}")
+                handle = parts[1] if parts[0] == "collections" else None
+                data = store.products_json(handle, query)
+                if data is None:
+                    return self._send(404, b"{}")
+                body = json.dumps(data).encode("utf-8")
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    store._count("not_modified")
+                    return self._send(304, etag=etag)
+                return self._send(200, body, etag=etag)
+
+            if parts[0] == "collections" and len(parts) == 2:
+                html = store.listing_html(parts[1])
+            elif parts[0] == "products" and len(parts) == 2:
+                html = store.product_html(parts[1])
+            else:
+                html = None
+            if html is None:
+                return self._send(404, b"not found", "text/html")
+            return self._send(200, html.encode("utf-8"), "text/html; charset=utf-8")
+
+    return Handler
+
+
+def serve(store, host="127.0.0.1", port=0):
+    """Start a threaded server for `store`; returns it (base URL: server.url)."""
+    srv = ThreadingHTTPServer((host, port), _handler(store))
+    srv.daemon_threads = True
+    srv.url = f"http://{host}:{srv.server_address[1]}"
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
@@ -0,0 +1,75 @@
+"""Synthetic Shopify-shaped catalogs for the end-to-end benchmark.
+
+make_catalog() builds raw /products.json records (plus the collection each
+one belongs to); churn() derives the next run's catalog by repricing,
+flipping stock, adding and removing a fraction of the products.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+CATEGORIES = ("Rings", "Earrings", "Necklaces", "Bracelets")
+MATERIALS = ("Gold Vermeil", "Sterling Silver", "Rhodium", "Rose Gold", "Mixed Metal")
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _iso(t):
+    return t.replace(microsecond=0).isoformat()
+
+
+def _handle(i):
+    return f"bench-product-{i:06d}"
+
+
+def _product(rng, i, category, variants, t):
+    base = round(rng.uniform(15, 400), 0)
+    return {
+        "id": 100000 + i,
+        "handle": _handle(i),
+        "title": f"{rng.choice(MATERIALS)} {category.rstrip('s')} {i}",
+        "product_type": category,
+        "published_at": _iso(t),
+        "updated_at": _iso(t),
+        "collection": category.lower(),
+        "variants": [
+            {
+                "id": (100000 + i) * 10 + v,
+                "title": MATERIALS[v % len(MATERIALS)] if variants > 1 else "Default Title",
+                "price": f"{base + 10 * v:.2f}",
+                "available": rng.random() > 0.08,
+            }
+            for v in range(variants)
+        ],
+    }
+
+
+def make_catalog(skus, categories=CATEGORIES, variants=3, seed=0):
+    rng = random.Random(seed)
+    return [
+        _product(rng, i, categories[i % len(categories)], variants,
+                 T0 + timedelta(minutes=rng.randint(0, 60 * 24 * 60)))
+        for i in range(skus)
+    ]
+
+
+def churn(catalog, rate, seed=0, now=None):
+    """Next run's catalog: `rate` of products repriced or restocked/sold out,
+    rate/4 removed and as many new ones added (updated_at bumped to `now`)."""
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc)
+    out = [dict(p, variants=[dict(v) for v in p["variants"]]) for p in catalog]
+    n = len(out)
+    for p in rng.sample(out, int(n * rate)):
+        v = rng.choice(p["variants"])
+        if rng.random() < 0.6:
+            v["price"] = f"{float(v['price']) * rng.choice((0.8, 0.9, 1.1, 1.25)):.2f}"
+        else:
+            v["available"] = not v["available"]
+        p["updated_at"] = _iso(now)
+    removed = set(rng.sample(range(n), int(n * rate / 4)))
+    out = [p for i, p in enumerate(out) if i not in removed]
+    categories = sorted({p["product_type"] for p in catalog}) or list(CATEGORIES)
+    next_id = max((p["id"] for p in catalog), default=100000) - 100000 + 1
+    variants = len(catalog[0]["variants"]) if catalog else 1
+    for j in range(len(removed)):
+        out.append(_product(rng, next_id + j, categories[j % len(categories)], variants, now))
+    return out
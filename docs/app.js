@@ -4,6 +4,65 @@ async function jget(path) {
   return r.json();
 }
 
+// 分片文件名带内容哈希，内容不变则文件名不变：可以放心走浏览器缓存
+const shardCache = {};
+function jshard(path) {
+  if (!shardCache[path]) {
+    shardCache[path] = fetch(`./data/${path}`, { cache: "force-cache" }).then(r => {
+      if (!r.ok) throw new Error(`Fetch failed: ${path}`);
+      return r.json();
+    });
+    shardCache[path].catch(() => { delete shardCache[path]; });
+  }
+  return shardCache[path];
+}
+
+function loadDetail(site) {
+  const path = site.shards && site.shards.detail;
+  return path ? jshard(path) : Promise.resolve({});
+}
+
+function loadProducts(site, cat) {
+  const path = site.shards && site.shards.products && site.shards.products[cat];
+  return path ? jshard(path) : Promise.resolve([]);
+}
+
+function loadPrices(site) {
+  const path = site.shards && site.shards.prices;
+  return path ? jshard(path) : Promise.resolve({});
+}
+
+function loadSparklines(site) {
+  const path = site.shards && site.shards.sparklines;
+  return path ? jshard(path) : Promise.resolve({});
+}
+
+// 近 N 天价格走势（只对有变化的商品）；缺货的点画成空心
+function sparkSvg(points) {
+  const pts = (points || []).filter(p => p[1] != null);
+  if (pts.length < 2) return "";
+  const w = 80, h = 18, pad = 2;
+  const ts = pts.map(p => Date.parse(p[0]));
+  const vs = pts.map(p => p[1]);
+  const t0 = Math.min(...ts), t1 = Math.max(...ts) || t0 + 1;
+  const v0 = Math.min(...vs), v1 = Math.max(...vs);
+  const x = t => pad + (w - 2 * pad) * (t1 === t0 ? 1 : (t - t0) / (t1 - t0));
+  const y = v => v1 === v0 ? h / 2 : pad + (h - 2 * pad) * (1 - (v - v0) / (v1 - v0));
+  // 阶梯线：价格在两个点之间保持不变
+  let d = `M${x(ts[0]).toFixed(1)},${y(vs[0]).toFixed(1)}`;
+  for (let i = 1; i < pts.length; i++) {
+    d += `H${x(ts[i]).toFixed(1)}V${y(vs[i]).toFixed(1)}`;
+  }
+  const dots = pts.map((p, i) => p[2] === 0
+    ? `<circle cx="${x(ts[i]).toFixed(1)}" cy="${y(vs[i]).toFixed(1)}" r="1.8" stroke="currentColor"/>`
+    : "").join("");
+  const title = pts.map(p => `${p[0].slice(0, 10)} ${p[1]}${p[2] === 0 ? " (缺货)" : ""}`).join("\n");
+  return `<svg class="spark" width="${w}" height="${h}" viewBox="0 0 ${w} ${h}"><title>${escapeHtml(title)}</title>` +
+    `<path d="${d}" fill="none" stroke="currentColor" stroke-width="1.2"/>${dots}</svg>`;
+}
+
+const LOADING = `<div class="muted" style="margin-top:10px;">加载中…</div>`;
+
 function escapeHtml(s) {
   return (s || "")
     .replaceAll("&", "&amp;")
@@ -32,10 +91,70 @@ function priceDelta(oldP, newP) {
   return "价格不变";
 }
 
-function groupBy(arr, key) {
+// 价格分位数 + 有货率（统计阶段算好，直接展示）
+function priceStatsLine(sym, st) {
+  if (!st || !st.priced) return "";
+  const pc = st.percentiles || {};
+  const ratio = st.in_stock_ratio == null ? "" : ` · 有货率 ${(st.in_stock_ratio * 100).toFixed(1)}%`;
+  return `<div class="muted" style="margin-top:6px;">价格 P25 ${sym}${pc.p25} · 中位 ${sym}${pc.p50} · P75 ${sym}${pc.p75}${ratio}</div>`;
+}
+
+// 与 stats.bucket_labels 一致："0-50" … "200+"
+function bucketDefs(edges, pb) {
+  if (!edges || !edges.length) return Object.keys(pb || {}).map(k => ({ key: k, text: k.replace("-", "–") }));
+  const out = [];
+  for (let i = 0; i + 1 < edges.length; i++) {
+    out.push({ key: `${edges[i]}-${edges[i + 1]}`, text: `${edges[i]}–${edges[i + 1]}` });
+  }
+  out.push({ key: `${edges[edges.length - 1]}+`, text: `${edges[edges.length - 1]}+` });
+  return out;
+}
+
+// 第一个 >= x 的位置（数组已按价格升序）
+function lowerBound(arr, x) {
+  let lo = 0, hi = arr.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (arr[mid] < x) lo = mid + 1; else hi = mid;
+  }
+  return lo;
+}
+
+function renderPriceQuery(site) {
+  return `
+    <div class="price-query" data-idx="${site._idx}" style="margin-top:10px;">
+      <input type="number" min="0" placeholder="最低价" data-role="lo" style="width:90px;">
+      –
+      <input type="number" min="0" placeholder="最高价" data-role="hi" style="width:90px;">
+      <div class="muted" data-role="out" style="margin-top:6px;"></div>
+    </div>
+  `;
+}
+
+// [lo, hi) 内的 SKU 数：每个品类在排好序的价格数组上二分两次
+async function updatePriceQuery(box, sites) {
+  const site = sites[Number(box.getAttribute("data-idx"))];
+  const sym = site.currency_symbol || "€";
+  const prices = await loadPrices(site);
+  const loRaw = box.querySelector('[data-role="lo"]').value;
+  const hiRaw = box.querySelector('[data-role="hi"]').value;
+  const lo = loRaw === "" ? -Infinity : Number(loRaw);
+  const hi = hiRaw === "" ? Infinity : Number(hiRaw);
+  let total = 0;
+  const parts = Object.keys(prices).sort().map(cat => {
+    const arr = prices[cat] || [];
+    const n = Math.max(0, lowerBound(arr, hi) - lowerBound(arr, lo));
+    total += n;
+    return `${escapeHtml(cat)} ${n}`;
+  });
+  const range = `${loRaw === "" ? "" : sym + loRaw}–${hiRaw === "" ? "" : sym + hiRaw}`;
+  box.querySelector('[data-role="out"]').innerHTML = `${range}：共 ${total} 个SKU · ${parts.join(" · ")}`;
+}
+
+function groupBy(arr, key, fn) {
   const m = {};
   for (const x of (arr || [])) {
-    const k = x[key] || "Other";
+    const k = (fn ? fn(x[key]) : x[key]) || "Other";
     (m[k] ||= []).push(x);
   }
   return m;
@@ -78,55 +197,82 @@ function renderOverview(sum) {
     .join("");
 }
 
-function renderSite(site) {
-  const sym = site.currency_symbol || "€";
-  const siteKey = site.site_id || site.name || 'site';
-
-  const badge = site.status === "ok"
-    ? `<span class="tag ok">正常</span>`
-    : `<span class="tag err">错误</span>`;
-
-  const headRight = site.status === "ok"
-    ? `<span class="muted">币种：${escapeHtml(site.currency_code || "")}</span>`
-    : `<span class="muted">${escapeHtml(site.error || "")}</span>`;
-
-  const counts = site.counts || {};
-
-  // 商品现状
-  const ps = site.product_status || {};
-  const statusPills = `
-    <div class="grid" style="grid-template-columns: repeat(3, minmax(0, 1fr));">
-      <div class="pill"><b>${ps.total ?? 0}</b><div class="muted">总SKU</div></div>
-      <div class="pill"><b>${ps.in_stock ?? 0}</b><div class="muted">在架SKU</div></div>
-      <div class="pill"><b>${ps.oos ?? 0}</b><div class="muted">缺货SKU</div></div>
-    </div>
-  `;
+// 变动流水：逐次运行的变动记录（来自 journal），按天折叠，最新在前
+function renderFeed(fd) {
+  if (!fd || !fd.records || !fd.records.length) return `近 ${fd && fd.days || 14} 天暂无变动记录`;
+  const byDay = groupBy(fd.records, "time_utc", t => (t || "").slice(0, 10));
+  const days = Object.keys(byDay).sort().reverse();
+  const head = `<div class="muted">近 ${fd.days} 天共 ${fd.total} 条变动${fd.total > fd.records.length ? `（显示最新 ${fd.records.length} 条）` : ""}</div>`;
+  return head + days.map(day => {
+    const rows = byDay[day].map(r => {
+      const price = r.type === "PRICE" ? ` · ${priceText("", r.old_price)} → ${priceText("", r.new_price)}` : "";
+      return `
+        <li class="change">
+          <span class="tag">${zhType(r.type)}</span>
+          <small>${escapeHtml(r.site_id)} · ${escapeHtml((r.time_utc || "").slice(11, 16))}</small>
+          <a href="${r.url || "#"}" target="_blank" rel="noreferrer">${escapeHtml(r.title || r.key || "")}</a>
+          <small>${escapeHtml(r.variant_label || "")}${price}</small>
+        </li>`;
+    }).join("");
+    return `
+      <details style="margin-top:8px;">
+        <summary style="cursor:pointer;">${day} <span class="muted">（${byDay[day].length}）</span></summary>
+        <ul>${rows}</ul>
+      </details>`;
+  }).join("");
+}
 
-  // 商品变动（结构化）
-  const changePills = `
-    <div class="grid" style="grid-template-columns: repeat(5, minmax(0, 1fr));">
-      <div class="pill"><b>${counts.new || 0}</b><div class="muted">新上架</div></div>
-      <div class="pill"><b>${counts.price || 0}</b><div class="muted">改价</div></div>
-      <div class="pill"><b>${counts.removed || 0}</b><div class="muted">下架</div></div>
-      <div class="pill"><b>${counts.oos || 0}</b><div class="muted">缺货</div></div>
-      <div class="pill"><b>${counts.restock || 0}</b><div class="muted">补货</div></div>
-    </div>
-  `;
+// 运行指标（metrics_latest.json）：最近一次运行的站点分阶段耗时 + 最近几次运行的概况
+function kb(n) {
+  return n == null ? "-" : `${(n / 1024).toFixed(0)} KB`;
+}
 
-  // 价格区间
-  const pb = site.price_buckets_total || {};
-  const bucketPills = `
-    <div class="grid" style="grid-template-columns: repeat(5, minmax(0, 1fr));">
-      <div class="pill"><b>${pb["0-50"] || 0}</b><div class="muted">0–50${sym}</div></div>
-      <div class="pill"><b>${pb["50-100"] || 0}</b><div class="muted">50–100${sym}</div></div>
-      <div class="pill"><b>${pb["100-150"] || 0}</b><div class="muted">100–150${sym}</div></div>
-      <div class="pill"><b>${pb["150-200"] || 0}</b><div class="muted">150–200${sym}</div></div>
-      <div class="pill"><b>${pb["200+"] || 0}</b><div class="muted">200+${sym}</div></div>
-    </div>
-  `;
+function renderMetrics(hist) {
+  if (!hist || !hist.length) return "暂无运行指标";
+  const last = hist[hist.length - 1];
+  const h = last.http || {};
+  const head = `<div class="muted">最近一次：耗时 ${last.wall_s}s · 请求 ${h.requests} · p50/p95 ${h.p50_ms ?? "-"}/${h.p95_ms ?? "-"} ms · 下载 ${kb(h.bytes_wire)} · 峰值内存 ${last.peak_rss_mb ?? "-"} MB · 抓取 ${last.sites_crawled} / 跳过 ${last.sites_skipped}</div>`;
+
+  const stageNames = [];
+  Object.values(last.sites || {}).forEach(m => Object.keys(m.stages || {}).forEach(k => {
+    if (!stageNames.includes(k)) stageNames.push(k);
+  }));
+  const siteRows = Object.entries(last.sites || {}).map(([id, m]) => {
+    const mh = m.http || {};
+    return `<tr>
+      <td>${escapeHtml(id)}</td><td>${escapeHtml(m.status || "")}</td><td>${m.wall_s ?? "-"}s</td>
+      ${stageNames.map(k => `<td>${m.stages && m.stages[k] != null ? m.stages[k].toFixed(2) : "-"}</td>`).join("")}
+      <td>${mh.requests ?? "-"}</td><td>${mh.p50_ms ?? "-"}/${mh.p95_ms ?? "-"}</td><td>${kb(mh.bytes_wire)}</td>
+      <td>${kb(m.snapshot_bytes_read)} / ${kb(m.snapshot_bytes_written)}</td>
+      <td>${mh.retries ?? 0}${m.retries ? ` (+${m.retries} 整站)` : ""}</td><td>${mh.throttled ?? 0}</td>
+    </tr>`;
+  }).join("");
+  const siteTable = `
+    <table class="metrics">
+      <tr><th>站点</th><th>状态</th><th>耗时</th>${stageNames.map(k => `<th>${escapeHtml(k)}</th>`).join("")}
+        <th>请求</th><th>p50/p95 ms</th><th>下载</th><th>快照读/写</th><th>重试</th><th>限流</th></tr>
+      ${siteRows}
+    </table>`;
+
+  const runRows = hist.slice(-10).reverse().map(r => `<tr>
+      <td>${escapeHtml((r.time_utc || "").replace("T", " ").slice(0, 16))}</td><td>${r.wall_s}s</td>
+      <td>${r.sites_crawled}</td><td>${(r.http || {}).requests ?? "-"}</td><td>${(r.http || {}).p95_ms ?? "-"}</td>
+      <td>${r.peak_rss_mb ?? "-"}</td><td>${r.errors}</td>
+    </tr>`).join("");
+  const runTable = `
+    <details style="margin-top:8px;">
+      <summary style="cursor:pointer;">最近 ${Math.min(hist.length, 10)} 次运行</summary>
+      <table class="metrics">
+        <tr><th>时间 (UTC)</th><th>耗时</th><th>站点</th><th>请求</th><th>p95 ms</th><th>内存 MB</th><th>错误</th></tr>
+        ${runRows}
+      </table>
+    </details>`;
+  return head + siteTable + runTable;
+}
 
-  // （低优先级）按品类查看：用于查看“商品变动”的分类拆分
-  const changes = (site.changes || []).slice(0, 400);
+function renderChangesByCategory(site, detail) {
+  const sym = site.currency_symbol || "€";
+  const changes = (detail.changes || []).slice(0, 400);
   const byCat = groupBy(changes, "category");
   const catHtml = Object.keys(byCat)
     .sort()
@@ -164,137 +310,258 @@ function renderSite(site) {
     })
     .join("");
 
-  const changesByCategoryBlock = `
-    <details style="margin-top:10px;">
-      <summary class="muted" style="cursor:pointer;">按品类查看（可选）</summary>
-      ${catHtml || `<div class="muted" style="margin-top:10px;">没有检测到变化。</div>`}
-    </details>
-  `;
+  return catHtml || `<div class="muted" style="margin-top:10px;">没有检测到变化。</div>`;
+}
 
-  // 明细 1：畅销
-  const bestsellers = (site.bestsellers || []).slice(0, 20);
-  const bestsellersHtml = `
-    <details class="accordion-item" data-site="${siteKey}" style="margin-top:10px;">
-      <summary class="muted" style="cursor:pointer;">畅销（默认折叠） · ${bestsellers.length}条</summary>
-      ${bestsellers.length ? `
-        <ul>
-          ${bestsellers.map(p => {
-            const title = escapeHtml(p.title || "");
-            const vlab = escapeHtml(p.variant_label || "");
-            const url = p.url || "#";
-            const priceNow = priceText(sym, [p.min_price, p.max_price]);
-            const stock = (p.available === false)
-              ? `<span class="tag err">缺货</span>`
-              : `<span class="tag ok">有货</span>`;
-            return `
-              <li class="change">
-                <a href="${url}" target="_blank" rel="noreferrer">${title}</a>
-                ${vlab ? `<small> · ${vlab}</small>` : ""}
-                <small> · 现价：${priceNow}</small>
-                <small> · ${stock}</small>
-              </li>
-            `;
-          }).join("")}
-        </ul>
-      ` : `<div class="muted" style="margin-top:10px;">未发现畅销集合（该站点可能未提供或命名不同）。</div>`}
-    </details>
+function renderBestsellers(site, detail) {
+  const sym = site.currency_symbol || "€";
+  const bestsellers = (detail.bestsellers || []).slice(0, 20);
+  if (!bestsellers.length) {
+    return `<div class="muted" style="margin-top:10px;">未发现畅销集合（该站点可能未提供或命名不同）。</div>`;
+  }
+  return `
+    <ul>
+      ${bestsellers.map(p => {
+        const title = escapeHtml(p.title || "");
+        const vlab = escapeHtml(p.variant_label || "");
+        const url = p.url || "#";
+        const priceNow = priceText(sym, [p.min_price, p.max_price]);
+        const stock = (p.available === false)
+          ? `<span class="tag err">缺货</span>`
+          : `<span class="tag ok">有货</span>`;
+        return `
+          <li class="change">
+            <a href="${url}" target="_blank" rel="noreferrer">${title}</a>
+            ${vlab ? `<small> · ${vlab}</small>` : ""}
+            <small> · 现价：${priceNow}</small>
+            <small> · ${stock}</small>
+          </li>
+        `;
+      }).join("")}
+    </ul>
   `;
+}
 
-  // 明细 2：变动SKU明细
-  const changesAll = (site.changes || []);
+function renderChangeDetails(site, detail) {
+  const sym = site.currency_symbol || "€";
+  const changesAll = (detail.changes || []);
   const changesByType = groupBy(changesAll, "type");
   const typeOrder = ["NEW", "PRICE", "REMOVED", "OOS", "RESTOCK"];
-  const changeDetailHtml = changesAll.length
-    ? typeOrder
-        .filter(t => (changesByType[t] || []).length)
-        .map(t => {
-          const items = (changesByType[t] || []).map(ch => {
-            const title = escapeHtml(ch.title || "");
-            const vlab = escapeHtml(ch.variant_label || "");
-            const cat = escapeHtml(ch.category || "Other");
-            const url = ch.url || "#";
-
-            let tag = zhType(ch.type);
-            let extra = "";
-            if (ch.type === "NEW") {
-              tag = "新上架";
-              extra = ` <small>（现价：${priceText(sym, ch.new_price)}）</small>`;
-            } else if (ch.type === "PRICE") {
-              tag = priceDelta(ch.old_price, ch.new_price);
-              extra = ` <small>（${priceText(sym, ch.old_price)} → ${priceText(sym, ch.new_price)}）</small>`;
-            }
-
-            return `
-              <li class="change">
-                <b>${tag}</b>
-                <a href="${url}" target="_blank" rel="noreferrer">${title}</a>
-                <small> · ${cat}${vlab ? ` · ${vlab}` : ""}</small>
-                ${extra}
-              </li>
-            `;
-          }).join("");
-
-          return `
-            <div style="margin-top:10px; padding-top:10px; border-top:1px solid #1e2a3a;">
-              <b>${zhType(t)}</b> <span class="muted">（${(changesByType[t] || []).length}）</span>
-              <ul>${items}</ul>
-            </div>
-          `;
-        })
-        .join("")
-    : `<div class="muted" style="margin-top:10px;">暂无变动 SKU。</div>`;
-
-  const changesDetailsBlock = `
-    <details class="accordion-item" data-site="${siteKey}" style="margin-top:10px;">
-      <summary class="muted" style="cursor:pointer;">变动SKU明细（默认折叠） · 共${changesAll.length}条</summary>
-      ${changeDetailHtml}
-    </details>
-  `;
-
-  // 明细 3：产品明细
-  const productsByCat = site.products_by_category || {};
-  const changeIndex = buildChangeIndex(site.changes || []);
+  if (!changesAll.length) {
+    return `<div class="muted" style="margin-top:10px;">暂无变动 SKU。</div>`;
+  }
+  return typeOrder
+    .filter(t => (changesByType[t] || []).length)
+    .map(t => {
+      const items = (changesByType[t] || []).map(ch => {
+        const title = escapeHtml(ch.title || "");
+        const vlab = escapeHtml(ch.variant_label || "");
+        const cat = escapeHtml(ch.category || "Other");
+        const url = ch.url || "#";
 
-  const productDetailsHtml = Object.keys(productsByCat)
-    .sort()
-    .map(cat => {
-      const items = productsByCat[cat] || [];
-      const rows = items.slice(0, 300).map(p => {
-        const ch = changeIndex[p.key];
-        let tag = "";
-        let priceExtra = "";
-
-        if (ch && ch.type === "NEW") {
-          tag = `<span class="tag ok">新上架</span>`;
-        } else if (ch && ch.type === "PRICE") {
-          tag = `<span class="tag ok">${priceDelta(ch.old_price, ch.new_price)}</span>`;
-          priceExtra = ` <small>（原价：${priceText(sym, ch.old_price)}）</small>`;
+        let tag = zhType(ch.type);
+        let extra = "";
+        if (ch.type === "NEW") {
+          tag = "新上架";
+          extra = ` <small>（现价：${priceText(sym, ch.new_price)}）</small>`;
+        } else if (ch.type === "PRICE") {
+          tag = priceDelta(ch.old_price, ch.new_price);
+          extra = ` <small>（${priceText(sym, ch.old_price)} → ${priceText(sym, ch.new_price)}）</small>`;
         }
 
-        const priceNow = priceText(sym, [p.min_price, p.max_price]);
-        const stock = (p.available === false)
-          ? `<span class="tag err">缺货</span>`
-          : `<span class="tag ok">有货</span>`;
-
         return `
           <li class="change">
-            ${tag}
-            <a href="${p.url}" target="_blank" rel="noreferrer">${escapeHtml(p.title || "")}</a>
-            <small> · ${escapeHtml(p.variant_label || "")}</small>
-            <small> · 现价：${priceNow}${priceExtra}</small>
-            <small> · ${stock}</small>
+            <b>${tag}</b>
+            <a href="${url}" target="_blank" rel="noreferrer">${title}</a>
+            <small> · ${cat}${vlab ? ` · ${vlab}` : ""}</small>
+            ${extra}
           </li>
         `;
       }).join("");
 
       return `
-        <div style="margin-top:12px;">
-          <b>${escapeHtml(cat)}</b> <span class="muted">（${items.length}）</span>
-          <ul>${rows}</ul>
+        <div style="margin-top:10px; padding-top:10px; border-top:1px solid #1e2a3a;">
+          <b>${zhType(t)}</b> <span class="muted">（${(changesByType[t] || []).length}）</span>
+          <ul>${items}</ul>
         </div>
       `;
     })
     .join("");
+}
+
+function renderProductList(site, items, detail, sparks) {
+  const sym = site.currency_symbol || "€";
+  const changeIndex = buildChangeIndex(detail.changes || []);
+  const rows = (items || []).slice(0, 300).map(p => {
+    const ch = changeIndex[p.key];
+    let tag = "";
+    let priceExtra = "";
+
+    if (ch && ch.type === "NEW") {
+      tag = `<span class="tag ok">新上架</span>`;
+    } else if (ch && ch.type === "PRICE") {
+      tag = `<span class="tag ok">${priceDelta(ch.old_price, ch.new_price)}</span>`;
+      priceExtra = ` <small>（原价：${priceText(sym, ch.old_price)}）</small>`;
+    }
+
+    const priceNow = priceText(sym, [p.min_price, p.max_price]);
+    const stock = (p.available === false)
+      ? `<span class="tag err">缺货</span>`
+      : `<span class="tag ok">有货</span>`;
+
+    return `
+      <li class="change">
+        ${tag}
+        <a href="${p.url}" target="_blank" rel="noreferrer">${escapeHtml(p.title || "")}</a>
+        <small> · ${escapeHtml(p.variant_label || "")}</small>
+        <small> · 现价：${priceNow}${priceExtra}</small>
+        <small> · ${stock}</small>
+        ${sparkSvg((sparks || {})[p.key])}
+      </li>
+    `;
+  }).join("");
+  return `<ul>${rows}</ul>`;
+}
+
+async function renderLazyPart(site, d) {
+  const part = d.getAttribute("data-part");
+  const detail = await loadDetail(site);
+  if (part === "changesByCat") return renderChangesByCategory(site, detail);
+  if (part === "bestsellers") return renderBestsellers(site, detail);
+  if (part === "changes") return renderChangeDetails(site, detail);
+  if (part === "priceQuery") return renderPriceQuery(site);
+  if (part === "products") {
+    const [items, sparks] = await Promise.all([
+      loadProducts(site, d.getAttribute("data-cat")),
+      loadSparklines(site),
+    ]);
+    return renderProductList(site, items, detail, sparks);
+  }
+  return "";
+}
+
+function setupLazyDetails(sites) {
+  document.querySelectorAll("details.lazy").forEach(d => {
+    d.addEventListener("toggle", async () => {
+      if (!d.open || d.dataset.loaded) return;
+      d.dataset.loaded = "1";
+      const body = d.querySelector(".lazy-body");
+      const site = sites[Number(d.getAttribute("data-idx"))];
+      try {
+        body.innerHTML = await renderLazyPart(site, d);
+      } catch (e) {
+        delete d.dataset.loaded;
+        body.innerHTML = `<div class="muted" style="margin-top:10px;">加载失败：${escapeHtml(String(e))}</div>`;
+      }
+    });
+  });
+
+  // 价格区间查询：输入变化时重新二分（价格分片只拉一次）
+  document.addEventListener("input", e => {
+    const box = e.target.closest && e.target.closest(".price-query");
+    if (box) updatePriceQuery(box, sites).catch(() => {});
+  });
+}
+
+function renderSite(site) {
+  const sym = site.currency_symbol || "€";
+  const siteKey = site.site_id || site.name || 'site';
+
+  // 调度跳过的站点：数据沿用上次抓取
+  const skippedTag = site.skipped
+    ? `<span class="tag" title="上次抓取 UTC：${escapeHtml(site.crawled_utc || "")}">本轮未抓取</span>`
+    : "";
+  const badge = (site.status === "ok"
+    ? `<span class="tag ok">正常</span>`
+    : `<span class="tag err">错误</span>`) + skippedTag;
+
+  const headRight = site.status === "ok"
+    ? `<span class="muted">币种：${escapeHtml(site.currency_code || "")}</span>`
+    : `<span class="muted">${escapeHtml(site.error || "")}</span>`;
+
+  const counts = site.counts || {};
+
+  // 商品现状
+  const ps = site.product_status || {};
+  const statusPills = `
+    <div class="grid" style="grid-template-columns: repeat(3, minmax(0, 1fr));">
+      <div class="pill"><b>${ps.total ?? 0}</b><div class="muted">总SKU</div></div>
+      <div class="pill"><b>${ps.in_stock ?? 0}</b><div class="muted">在架SKU</div></div>
+      <div class="pill"><b>${ps.oos ?? 0}</b><div class="muted">缺货SKU</div></div>
+    </div>
+    ${priceStatsLine(sym, site.price_stats_total)}
+  `;
+
+  // 商品变动（结构化）
+  const changePills = `
+    <div class="grid" style="grid-template-columns: repeat(5, minmax(0, 1fr));">
+      <div class="pill"><b>${counts.new || 0}</b><div class="muted">新上架</div></div>
+      <div class="pill"><b>${counts.price || 0}</b><div class="muted">改价</div></div>
+      <div class="pill"><b>${counts.removed || 0}</b><div class="muted">下架</div></div>
+      <div class="pill"><b>${counts.oos || 0}</b><div class="muted">缺货</div></div>
+      <div class="pill"><b>${counts.restock || 0}</b><div class="muted">补货</div></div>
+    </div>
+  `;
+
+  // 多窗口对比（1d / 3d / 7d / 30d …）
+  const wins = site.windows || {};
+  const winKeys = Object.keys(wins).sort((a, b) => (wins[a].days || 0) - (wins[b].days || 0));
+  const windowsHtml = winKeys.length ? `
+    <div class="muted" style="margin-top:8px;">
+      ${winKeys.map(k => {
+        const c = wins[k].counts || {};
+        return `${escapeHtml(k)}：新上架 ${c.new || 0} · 改价 ${c.price || 0} · 下架 ${c.removed || 0} · 缺货 ${c.oos || 0} · 补货 ${c.restock || 0}`;
+      }).join("<br/>")}
+    </div>
+  ` : "";
+
+  // 价格区间：分桶边界来自 config（price_edges），这里按边界动态生成
+  const pb = site.price_buckets_total || {};
+  const buckets = bucketDefs(site.price_edges, pb);
+  const bucketPills = `
+    <div class="grid" style="grid-template-columns: repeat(${Math.max(buckets.length, 1)}, minmax(0, 1fr));">
+      ${buckets.map(b => `<div class="pill"><b>${pb[b.key] || 0}</b><div class="muted">${b.text}${sym}</div></div>`).join("")}
+    </div>
+  `;
+
+  // 明细内容按需加载：展开时才去拉对应分片
+  const siteIdx = site._idx;
+
+  // （低优先级）按品类查看：用于查看“商品变动”的分类拆分
+  const changesByCategoryBlock = `
+    <details class="lazy" data-idx="${siteIdx}" data-part="changesByCat" style="margin-top:10px;">
+      <summary class="muted" style="cursor:pointer;">按品类查看（可选）</summary>
+      <div class="lazy-body">${LOADING}</div>
+    </details>
+  `;
+
+  // 明细 1：畅销
+  const bestsellersHtml = `
+    <details class="accordion-item lazy" data-site="${siteKey}" data-idx="${siteIdx}" data-part="bestsellers" style="margin-top:10px;">
+      <summary class="muted" style="cursor:pointer;">畅销（默认折叠） · ${site.bestseller_total || 0}条</summary>
+      <div class="lazy-body">${LOADING}</div>
+    </details>
+  `;
+
+  // 明细 2：变动SKU明细
+  const changesDetailsBlock = `
+    <details class="accordion-item lazy" data-site="${siteKey}" data-idx="${siteIdx}" data-part="changes" style="margin-top:10px;">
+      <summary class="muted" style="cursor:pointer;">变动SKU明细（默认折叠） · 共${site.change_total || 0}条</summary>
+      <div class="lazy-body">${LOADING}</div>
+    </details>
+  `;
+
+  // 明细 3：产品明细（每个品类一个分片）
+  const productCats = Object.keys((site.shards && site.shards.products) || {}).sort();
+  const skuByCat = site.sku_by_category || {};
+  const productDetailsHtml = productCats
+    .map(cat => `
+      <details class="lazy" data-idx="${siteIdx}" data-part="products" data-cat="${escapeHtml(cat)}" style="margin-top:12px;">
+        <summary style="cursor:pointer;"><b>${escapeHtml(cat)}</b> <span class="muted">（${skuByCat[cat] ?? 0}）</span></summary>
+        <div class="lazy-body">${LOADING}</div>
+      </details>
+    `)
+    .join("");
 
   const detailsBlock = `
     <details class="accordion-item" data-site="${siteKey}" style="margin-top:10px;">
@@ -335,12 +602,17 @@ function renderSite(site) {
             ? `对比基准：与 ${site.baseline_days || 3} 天前的快照对比（基准时间 UTC：${escapeHtml(site.baseline_time_utc)}）`
             : `对比基准：历史快照不足 ${site.baseline_days || 3} 天，暂用最近可用快照作为基准`}
         </div>
+        ${windowsHtml}
         ${changesByCategoryBlock}
       </div>
 
       <div style="margin-top:12px;">
         <div class="section-title" style="margin-bottom:8px;">价格区间内的 SKU 数量</div>
         ${bucketPills}
+        <details class="lazy" data-idx="${siteIdx}" data-part="priceQuery" style="margin-top:10px;">
+          <summary class="muted" style="cursor:pointer;">自定义价格区间（可选）</summary>
+          <div class="lazy-body">${LOADING}</div>
+        </details>
       </div>
 
       ${foldedHub}
@@ -363,8 +635,24 @@ async function main() {
 
     meta.textContent = `Last run (UTC): ${sum.time_utc} · Sites OK: ${sum.sites_ok} · Sites Error: ${sum.sites_error}`;
     overview.innerHTML = renderOverview(sum);
-    sitesEl.innerHTML = (sites || []).map(renderSite).join("");
+    const siteList = (sites || []).map((s, i) => ({ ...s, _idx: i }));
+    sitesEl.innerHTML = siteList.map(renderSite).join("");
     setupAccordions();
+    setupLazyDetails(siteList);
+
+    // 变动流水晚一点加载，不阻塞首屏
+    const feedEl = document.getElementById("feed");
+    if (feedEl) {
+      jget("./data/feed.json")
+        .then(fd => { feedEl.innerHTML = renderFeed(fd); })
+        .catch(() => { feedEl.textContent = "暂无变动流水"; });
+    }
+    const metricsEl = document.getElementById("metrics");
+    if (metricsEl) {
+      jget("./data/metrics_latest.json")
+        .then(hist => { metricsEl.innerHTML = renderMetrics(hist); })
+        .catch(() => { metricsEl.textContent = "暂无运行指标"; });
+    }
 
     if (errors && errors.length) {
       errorsEl.innerHTML = errors
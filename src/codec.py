@@ -0,0 +1,117 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+try:
+    import zstandard  # optional: pip install zstandard
+except ImportError:
+    zstandard = None
+
+
+@contextmanager
+def atomic_file(path, mode="w"):
+    """Write through a temp file unique to this writer, then move it onto `path`.
+
+    Concurrent writers of the same path (two sites producing the same
+    content-addressed object) each get their own temp file; the last
+    os.replace wins and every reader sees a complete file."""
+    d = os.path.dirname(path)
+    os.makedirs(d, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=d, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            yield f
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class JsonCodec:
+    """Pretty-printed JSON array (the original on-disk format). Not streamable."""
+    name = "json"
+    ext = ".json"
+
+    def write(self, path, records):
+        with atomic_file(path) as f:
+            json.dump(list(records), f, ensure_ascii=False, indent=2)
+
+    def iter(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+
+
+class _JsonLinesCodec(ABC):
+    """One compact JSON record per line inside a compressed stream.
+    Subclasses set name / ext and wrap the raw file in their compressor."""
+    name = None
+    ext = None
+
+    @abstractmethod
+    def _open_write(self, raw):
+        """Writable binary stream compressing into `raw`."""
+
+    @abstractmethod
+    def _open_read(self, raw):
+        """Readable binary stream decompressing `raw`."""
+
+    def write(self, path, records):
+        with atomic_file(path, "wb") as raw:
+            with self._open_write(raw) as z:
+                w = io.TextIOWrapper(z, encoding="utf-8")
+                for r in records:
+                    w.write(json.dumps(r, ensure_ascii=False, separators=(",", ":")))
+                    w.write("\n")
+                w.flush()
+                w.detach()
+
+    def iter(self, path):
+        with open(path, "rb") as raw:
+            with self._open_read(raw) as z:
+                for line in io.TextIOWrapper(z, encoding="utf-8"):
+                    if line.strip():
+                        yield json.loads(line)
+
+
+class GzipJsonLinesCodec(_JsonLinesCodec):
+    name = "jsonl.gz"
+    ext = ".jsonl.gz"
+
+    def _open_write(self, raw):
+        # mtime=0: identical content -> identical bytes, so git sees no change
+        return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0)
+
+    def _open_read(self, raw):
+        return gzip.GzipFile(fileobj=raw, mode="rb")
+
+
+class ZstdJsonLinesCodec(_JsonLinesCodec):
+    name = "jsonl.zst"
+    ext = ".jsonl.zst"
+
+    def _open_write(self, raw):
+        return zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=False)
+
+    def _open_read(self, raw):
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=False)
+
+
+CODECS = {c.name: c for c in (JsonCodec(), GzipJsonLinesCodec(), ZstdJsonLinesCodec())}
+
+
+def get_codec(name):
+    codec = CODECS.get(name or "json")
+    if codec is None:
+        raise ValueError(f"Unknown snapshot codec: {name!r} (known: {', '.join(CODECS)})")
+    if codec.name == "jsonl.zst" and zstandard is None:
+        raise RuntimeError("snapshot codec 'jsonl.zst' needs the optional 'zstandard' package")
+    return codec
+
@@ -1,3 +1,8 @@
+import heapq
+import pickle
+import tempfile
+
+_MISSING = object()
 
 def _index(products):
     return {p["key"]: p for p in (products or [])}
@@ -6,93 +11,204 @@ def _price_repr(p):
     return (p.get("min_price"), p.get("max_price"))
 
 def diff_snapshots(prev_products, cur_products):
-    prev = _index(prev_products)
-    cur = _index(cur_products)
+    return _diff(_index(prev_products), _index(cur_products))
+
+_ORDER = {"NEW": 0, "PRICE": 1, "REMOVED": 2, "OOS": 3, "RESTOCK": 4}
+
+def _zero_counts():
+    return {"new": 0, "removed": 0, "price": 0, "restock": 0, "oos": 0}
+
+def _change(type_, k, src, old, now, available_before, available_now):
+    return {
+        "type": type_,
+        "title": src.get("title"),
+        "variant_label": src.get("variant_label", ""),
+        "category": src.get("category", ""),
+        "old_price": _price_repr(old) if old else None,
+        "new_price": _price_repr(now) if now else None,
+        "available_before": available_before,
+        "available_now": available_now,
+        "url": src.get("product_url"),
+        "key": k,
+    }
+
+def _changes_for(k, old, now, counts):
+    """Change records for one key (old or now may be None), updating counts."""
+    if now is None:
+        counts["removed"] += 1
+        yield _change("REMOVED", k, old, old, None, old.get("available"), None)
+        return
+    if not old:
+        counts["new"] += 1
+        yield _change("NEW", k, now, None, now, None, now.get("available"))
+        return
+
+    if _price_repr(old) != _price_repr(now):
+        counts["price"] += 1
+        yield _change("PRICE", k, now, old, now, old.get("available"), now.get("available"))
+
+    if old.get("available") and not now.get("available"):
+        counts["oos"] += 1
+        yield _change("OOS", k, now, old, now, True, False)
+
+    if (old.get("available") is False) and now.get("available") is True:
+        counts["restock"] += 1
+        yield _change("RESTOCK", k, now, old, now, False, True)
 
+def _diff(prev, cur):
     changes = []
-    counts = {"new": 0, "removed": 0, "price": 0, "restock": 0, "oos": 0}
+    counts = _zero_counts()
 
     for k, now in cur.items():
-        old = prev.get(k)
-        if not old:
-            counts["new"] += 1
-            changes.append({
-                "type": "NEW",
-                "title": now.get("title"),
-                "variant_label": now.get("variant_label", ""),
-                "category": now.get("category", ""),
-                "old_price": None,
-                "new_price": _price_repr(now),
-                "available_before": None,
-                "available_now": now.get("available"),
-                "url": now.get("product_url"),
-                "key": k,
-            })
-            continue
-
-        if _price_repr(old) != _price_repr(now):
-            counts["price"] += 1
-            changes.append({
-                "type": "PRICE",
-                "title": now.get("title"),
-                "variant_label": now.get("variant_label", ""),
-                "category": now.get("category", ""),
-                "old_price": _price_repr(old),
-                "new_price": _price_repr(now),
-                "available_before": old.get("available"),
-                "available_now": now.get("available"),
-                "url": now.get("product_url"),
-                "key": k,
-            })
-
-        if old.get("available") and not now.get("available"):
-            counts["oos"] += 1
-            changes.append({
-                "type": "OOS",
-                "title": now.get("title"),
-                "variant_label": now.get("variant_label", ""),
-                "category": now.get("category", ""),
-                "old_price": _price_repr(old),
-                "new_price": _price_repr(now),
-                "available_before": True,
-                "available_now": False,
-                "url": now.get("product_url"),
-                "key": k,
-            })
-
-        if (old.get("available") is False) and now.get("available") is True:
-            counts["restock"] += 1
-            changes.append({
-                "type": "RESTOCK",
-                "title": now.get("title"),
-                "variant_label": now.get("variant_label", ""),
-                "category": now.get("category", ""),
-                "old_price": _price_repr(old),
-                "new_price": _price_repr(now),
-                "available_before": False,
-                "available_now": True,
-                "url": now.get("product_url"),
-                "key": k,
-            })
+        changes.extend(_changes_for(k, prev.get(k), now, counts))
 
     for k, old in prev.items():
         if k not in cur:
-            counts["removed"] += 1
-            changes.append({
-                "type": "REMOVED",
-                "title": old.get("title"),
-                "variant_label": old.get("variant_label", ""),
-                "category": old.get("category", ""),
-                "old_price": _price_repr(old),
-                "new_price": None,
-                "available_before": old.get("available"),
-                "available_now": None,
-                "url": old.get("product_url"),
-                "key": k,
-            })
-
-    order = {"NEW": 0, "PRICE": 1, "REMOVED": 2, "OOS": 3, "RESTOCK": 4}
-    changes.sort(key=lambda x: (order.get(x["type"], 9), (x.get("title") or "")))
+            changes.extend(_changes_for(k, old, None, counts))
+
+    changes.sort(key=lambda x: (_ORDER.get(x["type"], 9), (x.get("title") or "")))
 
     return changes, counts
 
+
+# ---- streaming mode: both sides sorted by key (as stored in snapshots) ----
+
+def _last_per_key(products):
+    """Collapse runs of equal keys in a key-sorted stream to the last one,
+    matching _index() where a later duplicate wins."""
+    pending = None
+    for p in products:
+        if pending is not None and (pending.get("key") or "") != (p.get("key") or ""):
+            yield pending
+        pending = p
+    if pending is not None:
+        yield pending
+
+def merge_diff(prev_sorted, cur_sorted, counts):
+    """Merge-join two key-sorted product streams, yielding change records one
+    at a time in key order. Holds one product per side in memory."""
+    prev_it = _last_per_key(prev_sorted)
+    cur_it = _last_per_key(cur_sorted)
+    old = next(prev_it, None)
+    now = next(cur_it, None)
+    while old is not None or now is not None:
+        ko = (old.get("key") or "") if old is not None else None
+        kn = (now.get("key") or "") if now is not None else None
+        if now is None or (old is not None and ko < kn):
+            yield from _changes_for(ko, old, None, counts)
+            old = next(prev_it, None)
+        elif old is None or kn < ko:
+            yield from _changes_for(kn, None, now, counts)
+            now = next(cur_it, None)
+        else:
+            yield from _changes_for(kn, old, now, counts)
+            old = next(prev_it, None)
+            now = next(cur_it, None)
+
+def _change_order(x):
+    return (_ORDER.get(x["type"], 9), x.get("title") or "", x.get("key") or "")
+
+def external_sort(records, key, max_in_memory=20000):
+    """Sort an iterable with at most max_in_memory records held at once:
+    sorted runs are spilled to temp files and lazily k-way merged."""
+    runs = []
+    chunk = []
+    try:
+        for r in records:
+            chunk.append(r)
+            if len(chunk) >= max_in_memory:
+                runs.append(_spill(sorted(chunk, key=key)))
+                chunk = []
+        chunk.sort(key=key)
+        if not runs:
+            yield from chunk
+            return
+        runs.append(_spill(chunk))
+        chunk = []
+        yield from heapq.merge(*(_unspill(f) for f in runs), key=key)
+    finally:
+        for f in runs:
+            f.close()
+
+def _spill(records):
+    f = tempfile.TemporaryFile()
+    for r in records:
+        pickle.dump(r, f, protocol=pickle.HIGHEST_PROTOCOL)
+    f.seek(0)
+    return f
+
+def _unspill(f):
+    while True:
+        try:
+            yield pickle.load(f)
+        except EOFError:
+            return
+
+def iter_diff_sorted(prev_sorted, cur_sorted, counts, max_in_memory=20000):
+    """Changes between two key-sorted streams in display order
+    (NEW/PRICE/REMOVED/OOS/RESTOCK, then title, then key). counts is filled
+    in place and is complete once the first record has been yielded."""
+    yield from external_sort(merge_diff(prev_sorted, cur_sorted, counts), _change_order, max_in_memory)
+
+def diff_sorted(prev_sorted, cur_sorted, max_in_memory=20000):
+    counts = _zero_counts()
+    changes = list(iter_diff_sorted(prev_sorted, cur_sorted, counts, max_in_memory))
+    return changes, counts
+
+def diff_counts(prev_sorted, cur_sorted):
+    """Only the counts of diff_sorted: one merge pass, no change list kept or sorted."""
+    counts = _zero_counts()
+    for _ in merge_diff(prev_sorted, cur_sorted, counts):
+        pass
+    return counts
+
+def diff_multi_sorted(cur_sorted, baselines, full=None, max_in_memory=20000):
+    """Diff a key-sorted catalog against several key-sorted baselines.
+
+    Returns {baseline_id: (changes, counts)}. Only the ids in `full` (all of
+    them when None) get their change list built and sorted; the rest get
+    (None, counts) from a counting pass. One merge pass per baseline, so
+    cur_sorted must be re-iterable (a list); each baseline is read once."""
+    return {
+        bid: diff_sorted(prev, cur_sorted, max_in_memory) if full is None or bid in full
+        else (None, diff_counts(prev, cur_sorted))
+        for bid, prev in baselines.items()
+    }
+
+
+def delta_products(prev_products, cur_products):
+    """Field-level delta prev -> cur, for storing a run as a diff on the previous one.
+    {"added": [product...], "removed": [key...], "changed": {key: {field: value}},
+     "unset": {key: [field...]}}"""
+    prev = _index(prev_products)
+    cur = _index(cur_products)
+
+    added = [now for k, now in cur.items() if k not in prev]
+    removed = [k for k in prev if k not in cur]
+    changed = {}
+    unset = {}
+    for k, now in cur.items():
+        old = prev.get(k)
+        if old is None or old == now:
+            continue
+        fields = {f: v for f, v in now.items() if old.get(f, _MISSING) != v}
+        if fields:
+            changed[k] = fields
+        gone = [f for f in old if f not in now]
+        if gone:
+            unset[k] = gone
+
+    return {"added": added, "removed": removed, "changed": changed, "unset": unset}
+
+def apply_delta(prev_products, delta):
+    cur = {p["key"]: dict(p) for p in (prev_products or [])}
+    for k in delta.get("removed", []):
+        cur.pop(k, None)
+    for k, fields in delta.get("changed", {}).items():
+        cur[k].update(fields)
+    for k, fields in delta.get("unset", {}).items():
+        for f in fields:
+            cur[k].pop(f, None)
+    for p in delta.get("added", []):
+        cur[p["key"]] = dict(p)
+    return list(cur.values())
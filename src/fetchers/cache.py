@@ -0,0 +1,168 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from codec import atomic_file
+
+
+class ValidatorCache:
+    """On-disk HTTP validator cache (ETag / Last-Modified per URL).
+
+    Each entry keeps the validators plus a caller-built payload (e.g. the
+    already-normalised products of a page), so a 304 can skip both the
+    download and the post-processing. Entries expire `max_age_days` after
+    they were stored, not after they were last revalidated, so a payload
+    built by older code is rebuilt from a full download at least that often.
+    """
+
+    def __init__(self, cache_dir, max_age_days=14):
+        self.cache_dir = cache_dir
+        self.max_age = float(max_age_days) * 86400
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        h = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, h[:2], h + ".json.gz")
+
+    def _read(self, path):
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def _expired(self, entry, now=None):
+        return (now or time.time()) - entry.get("t", 0) > self.max_age
+
+    def load(self, key):
+        entry = self._read(self._path(key))
+        if entry is None or entry.get("key") != key or self._expired(entry):
+            return None
+        return entry
+
+    def store(self, key, response, payload):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        with atomic_file(self._path(key), "wb") as raw:
+            with gzip.open(raw, "wt", encoding="utf-8") as f:
+                json.dump({
+                    "key": key,
+                    "t": int(time.time()),
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "payload": payload,
+                }, f, ensure_ascii=False)
+
+    @staticmethod
+    def validators(entry):
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def prune(self):
+        """Remove expired entries (by their stored time) and unreadable files."""
+        now = time.time()
+        for root, _, files in os.walk(self.cache_dir):
+            for fn in files:
+                path = os.path.join(root, fn)
+                entry = self._read(path)
+                if entry is None or self._expired(entry, now):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+
+class TtlStore:
+    """Small JSON map (one file) whose entries expire after `ttl_hours`.
+
+    Used for per-site discovery results such as the bestseller collection
+    handle; a stored None is a valid cached answer ("nothing found").
+    """
+
+    def __init__(self, path, ttl_hours=72):
+        self.path = path
+        self.ttl = float(ttl_hours) * 3600
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._data = json.load(f)
+        except (OSError, ValueError):
+            self._data = {}
+
+    def get(self, key):
+        """(hit, value); expired or missing entries are a miss."""
+        with self._lock:
+            entry = self._data.get(key)
+        if not entry or time.time() - entry.get("t", 0) > self.ttl:
+            return False, None
+        return True, entry.get("value")
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = {"value": value, "t": int(time.time())}
+            self._save()
+
+    def drop(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self._save()
+
+    def _save(self):
+        with atomic_file(self.path) as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+class CrawlCheckpoint:
+    """Progress of one site's listing crawl (one JSON file), so a retry or
+    the next run after a killed one resumes instead of starting over.
+
+    Per listing it keeps the products collected so far, the number of pages
+    fetched and, once finished, the crawl status. A checkpoint older than
+    `max_age_hours` or made for a different crawl `mode` (full vs.
+    incremental) is ignored, since its pages no longer match what the store
+    lists now. clear() drops it once the whole crawl succeeded.
+    """
+
+    def __init__(self, path, mode="full", max_age_hours=1):
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        fresh = time.time() - data.get("t", 0) <= float(max_age_hours) * 3600
+        if not fresh or data.get("mode") != mode:
+            data = {}
+        self.resumed = bool(data.get("listings"))
+        self._data = {"mode": mode, "t": data.get("t") or int(time.time()),
+                      "listings": data.get("listings") or {}}
+
+    def listing(self, label):
+        """{"products", "pages", "status"} saved for a listing, or None."""
+        with self._lock:
+            return self._data["listings"].get(label)
+
+    def save(self, label, products, pages, status=None):
+        with self._lock:
+            self._data["listings"][label] = {"products": products, "pages": pages, "status": status}
+            with atomic_file(self.path) as f:
+                json.dump(self._data, f, ensure_ascii=False, separators=(",", ":"))
+
+    def clear(self):
+        with self._lock:
+            self._data["listings"] = {}
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
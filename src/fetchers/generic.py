@@ -1,27 +1,353 @@
 
 import re
-import requests
+import json
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from bs4 import BeautifulSoup
+import requests
+from html import unescape
 from urllib.parse import urljoin
 
-UA = {"User-Agent": "CompetitorWatch/1.0 (+https://github.com/)"}
+from fetchers.transport import HostThrottled, default_client
+
 PRICE_RE = re.compile(r"(\d+[.,]?\d*)")
 
-def fetch_generic_catalog(site_cfg: dict, global_cfg: dict):
+# Structured data: regex-level scan, no DOM
+HEAD_END_RE = re.compile(r"</head\s*>", re.I)
+META_RE = re.compile(r"<meta\b[^>]*>", re.I)
+ATTR_RE = re.compile(r"""([\w:.-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+TITLE_RE = re.compile(r"<title\b[^>]*>(.*?)</title\s*>", re.I | re.S)
+JSONLD_RE = re.compile(
+    r"""<script\b[^>]*type\s*=\s*["']?application/ld\+json["']?[^>]*>(.*?)</script\s*>""",
+    re.I | re.S,
+)
+ITEMPROP_RE = re.compile(r"<[a-z][^>]*\bitemprop\s*=[^>]*>", re.I)
+DECIMAL_COMMA_RE = re.compile(r"^\d{1,3}(\.\d{3})*,\d{1,2}$|^\d+,\d{1,2}$")
+
+IN_STOCK = {"instock", "instoreonly", "onlineonly", "limitedavailability", "preorder", "presale", "backorder"}
+OUT_OF_STOCK = {"outofstock", "soldout", "discontinued"}
+
+
+def _meta_tags(head):
+    out = {}
+    for tag in META_RE.findall(head):
+        attrs = {}
+        for name, v1, v2, v3 in ATTR_RE.findall(tag):
+            attrs[name.lower()] = v1 or v2 or v3
+        prop = attrs.get("property") or attrs.get("name")
+        if prop and "content" in attrs and prop not in out:
+            out[prop] = unescape(attrs["content"])
+    return out
+
+
+def _microdata(html):
+    """itemprop=... values carried in attributes (content= / href=); text-only
+    itemprops need the tree and are left to the fallback."""
+    out = {}
+    for tag in ITEMPROP_RE.findall(html):
+        attrs = {}
+        for name, v1, v2, v3 in ATTR_RE.findall(tag):
+            attrs[name.lower()] = v1 or v2 or v3
+        prop = attrs.get("itemprop")
+        val = attrs.get("content") or attrs.get("href")
+        if prop and val and prop not in out:
+            out[prop] = unescape(val)
+    return out
+
+
+def _iter_jsonld_products(html):
+    """Yield every schema.org Product object from application/ld+json blocks."""
+    for raw in JSONLD_RE.findall(html):
+        try:
+            data = json.loads(raw.strip())
+        except Exception:
+            continue
+        stack = [data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(reversed(node))
+            elif isinstance(node, dict):
+                t = node.get("@type")
+                types = t if isinstance(t, list) else [t]
+                if "Product" in types or "ProductGroup" in types:
+                    yield node
+                elif "@graph" in node:
+                    stack.append(node["@graph"])
+
+
+def _to_float(v):
+    if v is None or isinstance(v, bool):
+        return None
+    if isinstance(v, (int, float)):
+        return float(v)
+    v = str(v).strip()
+    if DECIMAL_COMMA_RE.match(v):
+        v = v.replace(".", "").replace(",", ".")
+    try:
+        return float(v.replace(",", ""))
+    except Exception:
+        return None
+
+
+def _availability(v):
+    """schema.org / og availability -> True / False / None (unknown)."""
+    if not v:
+        return None
+    v = str(v).rsplit("/", 1)[-1].replace("_", "").replace(" ", "").lower()
+    if v in IN_STOCK:
+        return True
+    if v in OUT_OF_STOCK:
+        return False
+    return None
+
+
+def _iter_offers(node):
+    offers = node.get("offers")
+    stack = offers if isinstance(offers, list) else [offers]
+    for o in stack:
+        if not isinstance(o, dict):
+            continue
+        inner = o.get("offers")
+        if inner:
+            yield from (x for x in (inner if isinstance(inner, list) else [inner]) if isinstance(x, dict))
+        yield o
+
+
+def _from_jsonld(product):
+    nodes = [product]
+    variants = product.get("hasVariant")
+    if isinstance(variants, list):
+        nodes.extend(v for v in variants if isinstance(v, dict))
+    elif isinstance(variants, dict):
+        nodes.append(variants)
+
+    prices, avail = [], []
+    currency = None
+    sku = product.get("sku")
+    for node in nodes:
+        for o in _iter_offers(node):
+            for k in ("price", "lowPrice", "highPrice"):
+                p = _to_float(o.get(k))
+                if p is not None:
+                    prices.append(p)
+            spec = o.get("priceSpecification")
+            if isinstance(spec, dict) and _to_float(spec.get("price")) is not None:
+                prices.append(_to_float(spec.get("price")))
+                currency = currency or spec.get("priceCurrency")
+            currency = currency or o.get("priceCurrency")
+            a = _availability(o.get("availability"))
+            if a is not None:
+                avail.append(a)
+            sku = sku or o.get("sku")
+        sku = sku or node.get("sku")
+    if not prices:
+        return None
+    return {
+        "title": (product.get("name") or "").strip() if isinstance(product.get("name"), str) else "",
+        "min_price": min(prices),
+        "max_price": max(prices),
+        "currency": currency,
+        "available": any(avail) if avail else None,
+        "sku": str(sku) if sku is not None else None,
+        "source": "jsonld",
+    }
+
+
+def extract_product(html):
+    """Structured product extraction in one pass over the page.
+
+    Order: JSON-LD Product/Offer -> og/product meta tags -> microdata
+    attributes -> full tree + PRICE_RE over the page text (last resort).
+    Returns a dict with title, min_price, max_price, currency, available,
+    sku and source.
+    """
+    m = HEAD_END_RE.search(html)
+    head = html[:m.start()] if m else ""
+    meta = _meta_tags(head)
+
+    title_text = (meta.get("og:title") or "").strip()
+    if not title_text:
+        t = TITLE_RE.search(head)
+        title_text = unescape(t.group(1)).strip() if t else ""
+
+    info = None
+    for product in _iter_jsonld_products(html):
+        info = _from_jsonld(product)
+        if info:
+            break
+
+    if info is None:
+        price = _to_float(meta.get("product:price:amount") or meta.get("og:price:amount"))
+        if price is not None:
+            info = {
+                "min_price": price,
+                "max_price": price,
+                "currency": meta.get("product:price:currency") or meta.get("og:price:currency"),
+                "available": _availability(meta.get("product:availability") or meta.get("og:availability")),
+                "sku": meta.get("product:retailer_item_id"),
+                "source": "meta",
+            }
+
+    if info is None:
+        md = _microdata(html)
+        price = _to_float(md.get("price") or md.get("lowPrice"))
+        if price is not None:
+            info = {
+                "min_price": price,
+                "max_price": _to_float(md.get("highPrice")) or price,
+                "currency": md.get("priceCurrency"),
+                "available": _availability(md.get("availability")),
+                "sku": md.get("sku"),
+                "source": "microdata",
+            }
+
+    if info is not None and (title_text or info.get("title")):
+        info["title"] = title_text or info["title"]
+        return info
+
+    # Last resort: full tree
+    ps = BeautifulSoup(html, "lxml")
+    if not title_text:
+        title = (ps.select_one("meta[property='og:title']") or ps.select_one("title"))
+        title_text = title.get("content").strip() if title and title.has_attr("content") else (title.text.strip() if title else "")
+    if info is not None:
+        info["title"] = title_text
+        return info
+
+    price = None
+    ogp = ps.select_one("meta[property='product:price:amount']")
+    if ogp and ogp.get("content"):
+        price = _to_float(ogp["content"])
+    source = "meta"
+    if price is None:
+        source = "text"
+        text = ps.get_text(" ", strip=True)
+        m = PRICE_RE.search(text)
+        if m:
+            try:
+                price = float(m.group(1).replace(",", ""))
+            except Exception:
+                pass
+    return {
+        "title": title_text,
+        "min_price": price,
+        "max_price": price,
+        "currency": None,
+        "available": None,
+        "sku": None,
+        "source": source,
+    }
+
+
+def _parse_product_page(html):
+    """HTML -> extract_product() dict. Top-level so it can run in a worker process."""
+    return extract_product(html)
+
+
+def make_parse_pool(global_cfg):
+    """Process pool for product-page parsing (generic.parse_workers), or None to parse inline.
+    Create it once per run and pass it to every fetch_generic_catalog call."""
+    workers = int((global_cfg.get("generic", {}) or {}).get("parse_workers", 0))
+    if workers <= 0:
+        return None
+    # spawn: the crawl runs on threads, forking a threaded process is unsafe
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _fetch_page(http, url, timeout, deadline):
+    # Requests and their retries never run past the crawl deadline, whatever request_timeout_sec says
+    pr = http.get(url, timeout=timeout, deadline=deadline)
+    pr.raise_for_status()
+    return pr.text
+
+
+def _fetch_and_parse(urls, http, timeout, deadline, io_workers, parse_pool):
+    """Download `urls` on an I/O thread pool and parse them on `parse_pool`
+    (or inline when None). Returns {index: extract_product() dict}; pages that fail or
+    miss the deadline are left out, like the sequential loop used to skip them.
+    HostThrottled is raised: the rest of the pages would only hit the same pause."""
+    parsed = {}
+    if not urls:
+        return parsed
+
+    io = ThreadPoolExecutor(max_workers=max(1, min(io_workers, len(urls))), thread_name_prefix="generic-io")
+    try:
+        pending = {io.submit(_fetch_page, http, u, timeout, deadline): ("fetch", i) for i, u in enumerate(urls)}
+        while pending:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            done, _ = wait(pending, timeout=left, return_when=FIRST_COMPLETED)
+            for f in done:
+                stage, i = pending.pop(f)
+                try:
+                    res = f.result()
+                except HostThrottled:
+                    for g in pending:
+                        g.cancel()
+                    raise
+                except Exception:
+                    continue
+                if stage == "parse":
+                    parsed[i] = res
+                elif parse_pool is not None:
+                    pending[parse_pool.submit(_parse_product_page, res)] = ("parse", i)
+                else:
+                    try:
+                        parsed[i] = _parse_product_page(res)
+                    except Exception:
+                        continue
+        for f in pending:
+            f.cancel()
+    finally:
+        # Don't wait for fetches still in flight at the deadline; their own timeout ends them
+        io.shutdown(wait=False, cancel_futures=True)
+    return parsed
+
+
+def fetch_generic_catalog(site_cfg: dict, global_cfg: dict, http=None, previous=None, parse_pool=None):
+    """Crawl the category pages and every product page they link to.
+
+    If generic.deadline_sec runs out first, products of `previous` (the last
+    snapshot) that were listed but not fetched yet, or sit in categories not
+    reached, are carried over unchanged, so a cut-short crawl doesn't report
+    them as removed (and as new again next run).
+    parse_pool: the run's pool from make_parse_pool(); without one pages are parsed inline."""
+    http = http or default_client()
     timeout = int(global_cfg.get("schedule", {}).get("request_timeout_sec", 20))
     max_products = int(global_cfg.get("schedule", {}).get("max_products_per_site", 800))
 
+    gcfg = global_cfg.get("generic", {}) or {}
+    io_workers = int(gcfg.get("io_workers", 8))
+    deadline = time.monotonic() + float(gcfg.get("deadline_sec", 600))
+
     products = []
     meta = {"mode": "generic"}
 
     cats = site_cfg.get("categories", [])
     base_url = site_cfg["base_url"].rstrip("/")
 
+    prev_by_cat = {}
+    for p in (previous or {}).get("products") or []:
+        if (p.get("key") or "").startswith("generic:"):
+            prev_by_cat.setdefault(p.get("category"), []).append(p)
+    unfetched = set()
+    unreached = [c.get("label", "Category") for c in cats if c.get("url")]
+
     for c in cats:
         url = c.get("url")
         if not url:
             continue
-        r = requests.get(url, timeout=timeout, headers=UA)
+        try:
+            r = http.get(url, timeout=timeout, deadline=deadline)
+        except requests.Timeout:
+            if time.monotonic() < deadline:
+                raise
+            # The deadline ran out on the category page itself
+            meta["deadline_hit"] = True
+            break
         r.raise_for_status()
         soup = BeautifulSoup(r.text, "lxml")
 
@@ -35,48 +361,43 @@ def fetch_generic_catalog(site_cfg: dict, global_cfg: dict):
                 links.append(full)
 
         seen = set()
-        links = [x for x in links if not (x in seen or seen.add(x))]
+        links = [x for x in links if not (x in seen or seen.add(x))][:max_products]
 
-        for product_url in links[:max_products]:
-            try:
-                pr = requests.get(product_url, timeout=timeout, headers=UA)
-                pr.raise_for_status()
-                ps = BeautifulSoup(pr.text, "lxml")
-                title = (ps.select_one("meta[property='og:title']") or ps.select_one("title"))
-                title_text = title.get("content").strip() if title and title.has_attr("content") else (title.text.strip() if title else "")
-
-                price = None
-                ogp = ps.select_one("meta[property='product:price:amount']")
-                if ogp and ogp.get("content"):
-                    try:
-                        price = float(ogp["content"])
-                    except Exception:
-                        pass
-                if price is None:
-                    text = ps.get_text(" ", strip=True)
-                    m = PRICE_RE.search(text)
-                    if m:
-                        try:
-                            price = float(m.group(1).replace(",", ""))
-                        except Exception:
-                            pass
-
-                key = f"generic:{product_url}"
-                products.append({
-                    "key": key,
-                    "title": title_text,
-                    "variant_label": "",
-                    "min_price": price,
-                    "max_price": price,
-                    "currency": None,
-                    "available": True,
-                    "product_url": product_url,
-                    "category": c.get("label", "Category"),
-                    "published_at": None,
-                    "updated_at": None,
-                })
-            except Exception:
+        parsed = _fetch_and_parse(links, http, timeout, deadline, io_workers, parse_pool)
+        unreached.remove(c.get("label", "Category"))
+
+        for i, product_url in enumerate(links):
+            if i not in parsed:
                 continue
+            info = parsed[i]
+            key = f"generic:{product_url}"
+            products.append({
+                "key": key,
+                "title": info["title"],
+                "variant_label": "",
+                "min_price": info["min_price"],
+                "max_price": info["max_price"],
+                "currency": info["currency"],
+                "available": info["available"] if info["available"] is not None else True,
+                "sku": info["sku"],
+                "product_url": product_url,
+                "category": c.get("label", "Category"),
+                "published_at": None,
+                "updated_at": None,
+            })
 
-    return {"products": products, "meta": meta}
+        if time.monotonic() >= deadline:
+            meta["deadline_hit"] = True
+            unfetched.update(f"generic:{u}" for i, u in enumerate(links) if i not in parsed)
+            break
+
+    if meta.get("deadline_hit"):
+        have = {p["key"] for p in products}
+        carried = [
+            p for label, prods in prev_by_cat.items() for p in prods
+            if p["key"] not in have and (label in unreached or p["key"] in unfetched)
+        ]
+        products.extend(carried)
+        meta["carried_forward"] = len(carried)
 
+    return {"products": products, "meta": meta}
@@ -0,0 +1,124 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+def retry_after_seconds(value, now=None):
+    """Retry-After header (delta-seconds or HTTP-date) -> seconds, or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - (now or datetime.now(timezone.utc))).total_seconds())
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0, rng=random):
+    """Exponential back-off with full jitter: uniform(0, min(cap, base * 2**attempt))."""
+    return rng.uniform(0.0, min(float(cap), float(base) * (2 ** attempt)))
+
+
+class TokenBucket:
+    """`rate` tokens per second, up to `burst` banked. rate 0 = unlimited.
+
+    reserve() hands out tokens in call order and returns how long the caller
+    has to wait for its token, so concurrent callers are spaced evenly
+    instead of all retrying the moment a token appears."""
+
+    def __init__(self, rate=0.0, burst=1):
+        self.configured = float(rate or 0)
+        self.rate = self.configured
+        self.burst = max(1.0, float(burst or 1))
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+        self.paused_until = 0.0
+
+    def reserve(self, now):
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            self.tokens -= 1.0
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        else:
+            wait = 0.0
+        return max(wait, self.paused_until - now)
+
+
+class HostRateLimiter:
+    """One token bucket per host, shared by every fetcher using the client.
+
+    throttled() (a 429/503) pauses the host for the server's Retry-After and
+    halves its rate; each successful request wins back a twentieth of the
+    configured rate until it is reached again."""
+
+    def __init__(self, rate=0.0, burst=1, min_rate=0.2):
+        self.rate = float(rate or 0)
+        self.burst = burst
+        self.min_rate = float(min_rate)
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._overrides = {}
+        self._throttled = {}
+        self._waited = {}
+
+    def configure(self, host, rate=None, burst=None):
+        """Per-host limits (e.g. from a site's rate_per_sec / burst); None keeps the default."""
+        with self._lock:
+            self._overrides[host] = (rate, burst)
+            self._buckets.pop(host, None)
+
+    def _bucket(self, host):
+        b = self._buckets.get(host)
+        if b is None:
+            rate, burst = self._overrides.get(host, (None, None))
+            b = self._buckets[host] = TokenBucket(self.rate if rate is None else rate,
+                                                  self.burst if burst is None else burst)
+        return b
+
+    def acquire(self, host, max_pause=None):
+        """Wait for a token. If the host is paused for longer than `max_pause`,
+        take nothing and return the remaining pause instead (0.0 otherwise)."""
+        with self._lock:
+            b = self._bucket(host)
+            now = time.monotonic()
+            if max_pause is not None and b.paused_until - now > max_pause:
+                return b.paused_until - now
+            wait = b.reserve(now)
+            if wait > 0:
+                self._waited[host] = self._waited.get(host, 0.0) + wait
+        if wait > 0:
+            time.sleep(wait)
+        return 0.0
+
+    def throttled(self, host, delay):
+        with self._lock:
+            b = self._bucket(host)
+            b.paused_until = max(b.paused_until, time.monotonic() + delay)
+            if b.rate:
+                b.rate = max(self.min_rate, b.rate / 2.0)
+            self._throttled[host] = self._throttled.get(host, 0) + 1
+
+    def succeeded(self, host):
+        with self._lock:
+            b = self._buckets.get(host)
+            if b is not None and b.rate and b.rate < b.configured:
+                b.rate = min(b.configured, b.rate + b.configured / 20.0)
+
+    def stats(self):
+        with self._lock:
+            return {
+                host: {
+                    "rate_per_sec": b.rate,
+                    "throttled": self._throttled.get(host, 0),
+                    "waited_s": round(self._waited.get(host, 0.0), 3),
+                }
+                for host, b in self._buckets.items()
+            }
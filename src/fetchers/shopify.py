@@ -1,13 +1,48 @@
 
-import requests
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from urllib.parse import urlparse
 
-def _get_json(url, timeout=20):
-    r = requests.get(url, timeout=timeout, headers={
-        "User-Agent": "CompetitorWatch/1.0 (+https://github.com/)"
-    })
-    r.raise_for_status()
-    return r.json()
+import requests
+
+from fetchers.cache import CrawlCheckpoint
+from fetchers.ratelimit import backoff_delay
+from fetchers.transport import HostThrottled, default_client
+
+def _get_json(url, timeout=20, http=None):
+    return (http or default_client()).get_json(url, timeout=timeout)
+
+def _get_normalized_page(http, url, timeout, base, site_cfg, label):
+    """Fetch one collection page, revalidating against the on-disk ETag/Last-Modified
+    cache; an unchanged page (304) comes back already normalised."""
+    def build(data):
+        return [
+            _normalize_shopify_product(base, p, site_cfg, category_label=label)
+            for p in (data.get("products", []) or [])
+        ]
+
+    batch, _ = (http or default_client()).get_cached(url, timeout=timeout, build=build,
+                                                     variant=f"{label}@v{NORMALIZE_VERSION}")
+    return batch
+
+def _retryable(e):
+    # Only what HttpClient.get doesn't retry itself: a body cut off mid-read, broken JSON.
+    # Connection errors, timeouts and 429/5xx have already had http.max_retries tries.
+    if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+        return False
+    return isinstance(e, (requests.RequestException, ValueError)) and getattr(e, "response", None) is None
+
+def _get_page(http, url, timeout, base, site_cfg, label, retries=0):
+    """_get_normalized_page with up to `retries` more tries of the same page."""
+    for attempt in range(retries + 1):
+        try:
+            return _get_normalized_page(http, url, timeout, base, site_cfg, label)
+        except Exception as e:
+            if attempt >= retries or not _retryable(e):
+                raise
+            time.sleep(backoff_delay(attempt))
 
 def _collection_handle_from_url(url: str):
     parts = urlparse(url).path.strip("/").split("/")
@@ -15,53 +50,169 @@ def _collection_handle_from_url(url: str):
         return parts[1]
     return None
 
-def try_fetch_shopify(site_cfg: dict, global_cfg: dict):
+def _ts(value):
+    try:
+        t = datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+    return t.replace(tzinfo=timezone.utc) if t is not None and t.tzinfo is None else t
+
+def _newest_first(batch, last):
+    """(still ordered, newest-first updated_at so far) after checking `batch`."""
+    for norm in batch:
+        t = _ts(norm.get("updated_at"))
+        if t is None or (last is not None and t > last):
+            return False, last
+        last = t
+    return True, last
+
+def _crawl_pages(http, page_url, timeout, base, site_cfg, label, watermark=None,
+                 done=None, on_page=None, page_retries=0):
+    """Page through one listing. With a watermark (newest updated_at already
+    stored for this listing), stop after the first page that reaches it, but
+    only while every product seen so far is ordered newest-first by
+    updated_at; otherwise page to the end.
+    done: {"products", "pages"} from a checkpoint, to continue after those
+    pages; on_page(products, pages) is called after every full page.
+    Returns (products, pages, status) with status "full", "early" or "unordered"."""
+    products = list(done["products"]) if done else []
+    pages = done["pages"] if done else 0
+    ordered, last = (watermark is not None), None
+    if ordered:
+        ordered, last = _newest_first(products, None)
+    while True:
+        batch = _get_page(http, page_url(pages + 1), timeout, base, site_cfg, label, page_retries)
+        pages += 1
+        if not batch:
+            return products, pages, "full" if watermark is None or ordered else "unordered"
+        products.extend(batch)
+        if ordered:
+            ordered, last = _newest_first(batch, last)
+            if ordered and last is not None and last <= watermark:
+                return products, pages, "early"
+        if on_page is not None:
+            on_page(products, pages)
+
+def _watermarks(previous):
+    """Newest updated_at per category in the previous snapshot."""
+    marks = {}
+    for p in (previous or {}).get("products") or []:
+        t = _ts(p.get("updated_at"))
+        cat = p.get("category")
+        if t is not None and (cat not in marks or t > marks[cat]):
+            marks[cat] = t
+    return marks
+
+def _incremental_plan(site_cfg, global_cfg, previous):
+    """(watermarks or None, last_full_sweep_utc). None means a full sweep."""
+    inc_cfg = dict(global_cfg.get("shopify", {}) or {})
+    inc_cfg.update(site_cfg.get("shopify", {}) or {})
+    if not inc_cfg.get("incremental") or not previous or not previous.get("products"):
+        return None, None
+    last_full = ((previous.get("meta") or {}).get("incremental") or {}).get("last_full_sweep_utc")
+    last_full_t = _ts(last_full)
+    sweep = timedelta(hours=float(inc_cfg.get("full_sweep_hours", 24)))
+    if last_full_t is None or datetime.now(timezone.utc) - last_full_t >= sweep:
+        return None, None
+    return _watermarks(previous), last_full
+
+def try_fetch_shopify(site_cfg: dict, global_cfg: dict, http=None, previous=None, profile=None,
+                      checkpoint_dir=None):
+    """previous: the site's last snapshot; with shopify.incremental enabled it
+    supplies watermarks and the products behind an early exit, and a full
+    sweep runs every shopify.full_sweep_hours to pick up removals.
+    profile: the site's stored platform profile; its bestseller_handle skips
+    the handle probe (see _try_fetch_bestsellers). The result's "profile"
+    carries what this crawl found, for the caller to store.
+    checkpoint_dir: keep a CrawlCheckpoint per site there, so a failed or
+    killed crawl resumes at the first listing page it had not finished."""
     base = site_cfg["base_url"].rstrip("/")
     timeout = int(global_cfg.get("schedule", {}).get("request_timeout_sec", 20))
     max_products = int(global_cfg.get("schedule", {}).get("max_products_per_site", 800))
+    shopify_cfg = dict(global_cfg.get("shopify", {}) or {})
+    shopify_cfg.update(site_cfg.get("shopify", {}) or {})
+
+    watermarks, last_full = _incremental_plan(site_cfg, global_cfg, previous)
+    inc_meta = {
+        "mode": "full" if watermarks is None else "incremental",
+        "last_full_sweep_utc": last_full or datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+        "pages": 0,
+        "early_exit": [],
+        "unordered": [],
+        "resumed": [],
+    }
+    meta = {"mode": "shopify", "incremental": inc_meta}
+    checkpoint = None
+    if checkpoint_dir:
+        checkpoint = CrawlCheckpoint(os.path.join(checkpoint_dir, f"{site_cfg['id']}.json"), mode=inc_meta["mode"],
+                                     max_age_hours=float(shopify_cfg.get("checkpoint_max_age_hours", 1)))
+    page_retries = int(shopify_cfg.get("page_retries", 2))
+    # Bestsellers are probed on the side while the collections are crawled
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="bestsellers") as side:
+        known = (profile or {}).get("bestseller_handle", UNKNOWN)
+        bestsellers = side.submit(_try_fetch_bestsellers, base, timeout=timeout, limit=20, http=http, known=known)
+        products = _crawl_listings(http, site_cfg, base, timeout, max_products, watermarks, previous, inc_meta,
+                                   checkpoint, page_retries)
+        if checkpoint is not None:
+            checkpoint.clear()
+        items, handle = bestsellers.result()
+        found = {"platform": "shopify"}
+        if handle is not UNKNOWN:
+            found["bestseller_handle"] = handle
+        return {"products": products, "meta": meta, "bestsellers": items, "profile": found}
+
+def _crawl_listings(http, site_cfg, base, timeout, max_products, watermarks, previous, inc_meta,
+                    checkpoint=None, page_retries=0):
+    """All category listings (or the whole catalog), deduplicated by key and
+    capped at max_products; fills inc_meta with page/early-exit stats.
+    Listings (and pages) already in the checkpoint are not fetched again."""
+    listings = []
+    for c in site_cfg.get("categories", []):
+        handle = _collection_handle_from_url(c.get("url", ""))
+        if handle:
+            listings.append((c.get("label", handle), f"{base}/collections/{handle}/products.json?limit=250&page={{}}"))
+    if not site_cfg.get("categories"):
+        listings.append(("All", f"{base}/products.json?limit=250&page={{}}"))
+
+    prev_by_cat = {}
+    for p in (previous or {}).get("products") or []:
+        prev_by_cat.setdefault(p.get("category"), []).append(p)
 
     products = []
-    meta = {"mode": "shopify"}
-    bestsellers = _try_fetch_bestsellers(base, timeout=timeout, limit=20)
-
-    cats = site_cfg.get("categories", [])
-    if cats:
-        seen = set()
-        for c in cats:
-            handle = _collection_handle_from_url(c.get("url", ""))
-            if not handle:
+    seen = set()
+    for label, url in listings:
+        watermark = watermarks.get(label) if watermarks is not None else None
+        saved = checkpoint.listing(label) if checkpoint is not None else None
+        if saved:
+            inc_meta["resumed"].append(label)
+        if saved and saved.get("status"):
+            batch, pages, status = saved["products"], 0, saved["status"]
+        else:
+            on_page = None
+            if checkpoint is not None:
+                on_page = lambda prods, n, label=label: checkpoint.save(label, prods, n)
+            batch, pages, status = _crawl_pages(http, url.format, timeout, base, site_cfg, label, watermark,
+                                                done=saved, on_page=on_page, page_retries=page_retries)
+            if checkpoint is not None:
+                checkpoint.save(label, batch, pages, status)
+            if saved:
+                pages -= saved["pages"]
+        inc_meta["pages"] += pages
+        if status == "early":
+            inc_meta["early_exit"].append(label)
+            # Later pages are no newer than the last snapshot: reuse its products
+            batch = batch + prev_by_cat.get(label, [])
+        elif status == "unordered":
+            inc_meta["unordered"].append(label)
+        for norm in batch:
+            if norm["key"] in seen:
                 continue
-            page = 1
-            while True:
-                url = f"{base}/collections/{handle}/products.json?limit=250&page={page}"
-                data = _get_json(url, timeout=timeout)
-                batch = data.get("products", [])
-                if not batch:
-                    break
-                for p in batch:
-                    norm = _normalize_shopify_product(base, p, site_cfg, category_label=c.get("label", handle))
-                    if norm["key"] in seen:
-                        continue
-                    seen.add(norm["key"])
-                    products.append(norm)
-                    if len(products) >= max_products:
-                        return {"products": products, "meta": meta, "bestsellers": bestsellers}
-                page += 1
-    else:
-        page = 1
-        while True:
-            url = f"{base}/products.json?limit=250&page={page}"
-            data = _get_json(url, timeout=timeout)
-            batch = data.get("products", [])
-            if not batch:
-                break
-            for p in batch:
-                products.append(_normalize_shopify_product(base, p, site_cfg, category_label="All"))
-                if len(products) >= max_products:
-                    return {"products": products, "meta": meta, "bestsellers": bestsellers}
-            page += 1
-
-    return {"products": products, "meta": meta, "bestsellers": bestsellers}
+            seen.add(norm["key"])
+            products.append(norm)
+            if len(products) >= max_products:
+                return products
+
+    return products
 
 def _pick_variant_label(variant):
     title = (variant.get("title") or "").strip()
@@ -69,6 +220,11 @@ def _pick_variant_label(variant):
         return title
     return ""
 
+# Part of the validator-cache key of every normalised page: bump it whenever
+# _normalize_shopify_product's output changes, or unchanged (304) pages keep
+# serving the old shape.
+NORMALIZE_VERSION = 1
+
 def _normalize_shopify_product(base_url, p: dict, site_cfg: dict, category_label: str):
     handle = p.get("handle", "")
     product_url = f"{base_url}/products/{handle}" if handle else base_url
@@ -110,35 +266,64 @@ def _normalize_shopify_product(base_url, p: dict, site_cfg: dict, category_label
         "updated_at": p.get("updated_at"),
     }
 
-def _try_fetch_bestsellers(base: str, timeout: int = 20, limit: int = 20):
-    """
-    Best effort: attempt common Shopify bestsellers collection handles.
-    """
-    candidate_handles = [
-        "bestsellers",
-        "best-sellers",
-        "best-selling",
-        "best-selling-products",
-        "top-sellers",
-        "trending",
+# Sentinel for "no stored answer yet" (a stored None means "store has none")
+UNKNOWN = object()
+
+BESTSELLER_HANDLES = (
+    "bestsellers",
+    "best-sellers",
+    "best-selling",
+    "best-selling-products",
+    "top-sellers",
+    "trending",
+)
+
+def _fetch_bestseller_handle(base, handle, timeout, limit, http=None):
+    """The collection's products; [] if it is missing (404) or empty, None if
+    the probe failed (timeout, 429/5xx, bad JSON) and says nothing either way.
+    HostThrottled propagates, so the caller skips the site."""
+    url = f"{base}/collections/{handle}/products.json?limit={limit}&page=1"
+    try:
+        data = _get_json(url, timeout=timeout, http=http)
+    except HostThrottled:
+        raise
+    except Exception as e:
+        if getattr(getattr(e, "response", None), "status_code", None) == 404:
+            return []
+        return None
+    return [
+        _normalize_shopify_product(base, p, {}, category_label="Bestsellers")
+        for p in (data.get("products", []) or [])
     ]
 
-    for h in candidate_handles:
-        url = f"{base}/collections/{h}/products.json?limit={limit}&page=1"
-        try:
-            data = _get_json(url, timeout=timeout)
-            batch = data.get("products", []) or []
-            if not batch:
-                continue
-            out = []
-            for p in batch:
-                out.append(
-                    _normalize_shopify_product(
-                        base, p, {}, category_label="Bestsellers"
-                    )
-                )
-            return out
-        except Exception:
-            continue
+def _try_fetch_bestsellers(base: str, timeout: int = 20, limit: int = 20, http=None, known=UNKNOWN):
+    """
+    Best effort: find the store's bestsellers collection among common handles.
+    known: the handle that worked last time, or None for "no such
+    collection", so warm runs make one request or none. Without it (or when
+    it stops returning products) every candidate is asked at once and the
+    first one, in BESTSELLER_HANDLES order, that returns products wins.
+    Returns (products, handle or None). A failed probe proves nothing: then
+    the handle is `known` (if that probe failed) or UNKNOWN, never None.
+    """
+    if known is None:
+        return [], None
+    if known is not UNKNOWN:
+        out = _fetch_bestseller_handle(base, known, timeout, limit, http)
+        if out is None:
+            return [], known
+        if out:
+            return out, known
 
-    return []
\ No newline at end of file
+    failed = False
+    with ThreadPoolExecutor(max_workers=len(BESTSELLER_HANDLES), thread_name_prefix="bestsellers") as pool:
+        futures = [
+            (h, pool.submit(_fetch_bestseller_handle, base, h, timeout, limit, http))
+            for h in BESTSELLER_HANDLES
+        ]
+        for h, f in futures:
+            out = f.result()
+            if out:
+                return out, h
+            failed = failed or out is None
+    return [], UNKNOWN if failed else None
@@ -0,0 +1,235 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from fetchers.cache import ValidatorCache
+from fetchers.ratelimit import HostRateLimiter, backoff_delay, retry_after_seconds
+
+UA = "CompetitorWatch/1.0 (+https://github.com/)"
+
+try:
+    import brotli  # noqa: F401  (in requirements.txt; lets urllib3 decode "br", so only ask for it when present)
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+# Retried with back-off; 429/503 also throttle the whole host (see HostRateLimiter)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+THROTTLE_STATUS = {429, 503}
+
+
+class HostThrottled(Exception):
+    """The host asked for a pause (Retry-After) longer than the client's
+    retry_after_max. The host stays paused; the caller should give up on it
+    for this run rather than retry."""
+
+    def __init__(self, host, wait, response=None):
+        super().__init__(f"{host} asked to wait {wait:.0f}s (Retry-After), more than retry_after_max")
+        self.host = host
+        self.wait = wait
+        self.response = response
+
+
+class HttpClient:
+    """Shared transport for all fetchers.
+
+    One requests.Session with keep-alive pools per host, so every
+    products.json page / product page after the first reuses the open
+    TCP+TLS connection. Also keeps counters for connection reuse and
+    bytes on the wire, and per-host request latencies (see host_stats).
+
+    Every request takes a token from its host's bucket (`limiter`), and
+    429 / 5xx answers and connection errors are retried up to `max_retries`
+    times: after the server's Retry-After when it sends one, otherwise with
+    exponential back-off and full jitter. A Retry-After longer than
+    `retry_after_max` pauses the host for that long and raises HostThrottled,
+    as does any later request to the host while the pause lasts.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, cache_dir=None, rate_per_sec=0, burst=1,
+                 max_retries=3, backoff_base=0.5, backoff_max=30.0, retry_after_max=120.0, cache_max_age_days=14):
+        self.session = requests.Session()
+        self.session.headers.update({
+            "User-Agent": UA,
+            "Accept-Encoding": ACCEPT_ENCODING,
+        })
+        adapter = HTTPAdapter(pool_connections=int(pool_connections), pool_maxsize=int(pool_maxsize))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._adapters = [adapter]
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._bytes_wire = 0
+        self._bytes_body = 0
+        self._connections = 0
+        self._not_modified = 0
+        self._by_host = {}
+        self.cache = ValidatorCache(cache_dir, max_age_days=cache_max_age_days) if cache_dir else None
+        self.limiter = HostRateLimiter(rate_per_sec, burst)
+        self.max_retries = int(max_retries)
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        self.retry_after_max = float(retry_after_max)
+
+    def get(self, url, timeout=20, headers=None, deadline=None, **kwargs):
+        """deadline: a time.monotonic() value. Each attempt's timeout is cut to the
+        time left, and a retry whose wait would end past it is not made: the last
+        answer is returned (or the error raised), or requests.Timeout if no
+        attempt could start at all."""
+        host = (urlparse(url).hostname or "").lower()
+
+        def left():
+            return float("inf") if deadline is None else deadline - time.monotonic()
+
+        for attempt in range(self.max_retries + 1):
+            paused = self.limiter.acquire(host, max_pause=min(self.retry_after_max, max(0.0, left())))
+            if paused > self.retry_after_max:
+                raise HostThrottled(host, paused)
+            if paused or left() <= 0:
+                raise requests.Timeout(f"deadline reached before GET {url}")
+            last = attempt == self.max_retries
+            try:
+                r = self._send(host, url, min(timeout, left()), headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                if last or delay >= left():
+                    raise
+                self._count_retry(host)
+                time.sleep(delay)
+                continue
+            if r.status_code not in RETRY_STATUS or last:
+                if r.status_code < 400:
+                    self.limiter.succeeded(host)
+                return r
+            wait = retry_after_seconds(r.headers.get("Retry-After"))
+            if wait is not None and wait > self.retry_after_max:
+                self.limiter.throttled(host, wait)
+                raise HostThrottled(host, wait, r)
+            if wait is None:
+                wait = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+            if r.status_code in THROTTLE_STATUS:
+                # The pause applies to every request for this host, not just this one
+                self.limiter.throttled(host, wait)
+            if wait >= left():
+                return r
+            if r.status_code not in THROTTLE_STATUS:
+                time.sleep(wait)
+            self._count_retry(host)
+        return r
+
+    def _send(self, host, url, timeout, headers, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            r = self.session.get(url, timeout=timeout, headers=headers, **kwargs)
+        except Exception:
+            self._count_host(host, t0, None, 0, 0)
+            raise
+        body = len(r.content)
+        try:
+            wire = r.raw.tell() or body
+        except Exception:
+            wire = body
+        with self._lock:
+            self._requests += 1
+            self._bytes_wire += wire
+            self._bytes_body += body
+            if r.status_code == 304:
+                self._not_modified += 1
+        self._count_host(host, t0, r.status_code, wire, body)
+        return r
+
+    def _count_host(self, host, t0, status, wire, body):
+        ms = round((time.perf_counter() - t0) * 1000.0, 1)
+        with self._lock:
+            h = self._by_host.get(host)
+            if h is None:
+                h = self._by_host[host] = {"requests": 0, "errors": 0, "not_modified": 0, "retries": 0,
+                                           "bytes_wire": 0, "bytes_body": 0, "latency_ms": []}
+            h["requests"] += 1
+            h["bytes_wire"] += wire
+            h["bytes_body"] += body
+            h["latency_ms"].append(ms)
+            if status is None or status >= 400:
+                h["errors"] += 1
+            elif status == 304:
+                h["not_modified"] += 1
+
+    def _count_retry(self, host):
+        with self._lock:
+            self._by_host[host]["retries"] += 1
+
+    def host_stats(self):
+        """{host: counters + latency_ms list, plus the limiter's throttled / waited_s};
+        failed connections count as errors."""
+        limits = self.limiter.stats()
+        with self._lock:
+            return {host: dict(h, latency_ms=list(h["latency_ms"]), **limits.get(host, {}))
+                    for host, h in self._by_host.items()}
+
+    def get_json(self, url, timeout=20):
+        r = self.get(url, timeout=timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def get_cached(self, url, timeout=20, build=None, variant=""):
+        """Conditional GET of a JSON resource through the validator cache.
+
+        `build(data)` turns the decoded JSON into the payload that is stored
+        next to the validators; on a 304 the stored payload is returned as-is.
+        Returns (payload, not_modified).
+        """
+        build = build or (lambda data: data)
+        key = f"{url}#{variant}" if variant else url
+        entry = self.cache.load(key) if self.cache else None
+        r = self.get(url, timeout=timeout, headers=ValidatorCache.validators(entry) or None)
+        if r.status_code == 304 and entry is not None:
+            return entry["payload"], True
+        r.raise_for_status()
+        payload = build(r.json())
+        if self.cache:
+            self.cache.store(key, r, payload)
+        return payload, False
+
+    def _connections_opened(self):
+        n = 0
+        for adapter in self._adapters:
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is not None:
+                    n += pool.num_connections
+        # Pools evicted from the LRU container are gone; never report fewer than seen before.
+        with self._lock:
+            self._connections = max(self._connections, n)
+            return self._connections
+
+    def stats(self):
+        conns = self._connections_opened()
+        with self._lock:
+            reqs = self._requests
+            return {
+                "requests": reqs,
+                "connections_opened": conns,
+                "connections_reused": max(0, reqs - conns),
+                "bytes_wire": self._bytes_wire,
+                "bytes_body": self._bytes_body,
+                "not_modified": self._not_modified,
+            }
+
+    def close(self):
+        self.session.close()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_client():
+    """Fallback client for callers that don't pass one in."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HttpClient()
+        return _default
@@ -0,0 +1,182 @@
+"""Append-only change journal (docs/data/journal/).
+
+Each run's changes against the site's previous run are appended as compact
+JSON lines to journal/<YYYY-MM-DD>.jsonl; journal/index.json counts records
+per date, site and change type so queries only open the days they need.
+Days older than the retention window are deleted along with their index entry.
+
+    python src/journal.py query --days 14 --type PRICE [--site brand_a]
+    python src/journal.py backfill          # replay docs/data/snapshots
+"""
+import argparse
+import json
+import os
+import threading
+from datetime import datetime, timezone, timedelta
+
+from codec import atomic_file
+
+_lock = threading.Lock()
+
+INDEX_FILE = "index.json"
+# Fields kept from a diff change record; empty values are dropped
+FIELDS = ("type", "key", "title", "variant_label", "category", "old_price", "new_price",
+          "available_before", "available_now", "url")
+
+
+def _day(time_utc):
+    return time_utc[:10]
+
+
+def _load_index(journal_dir):
+    try:
+        with open(os.path.join(journal_dir, INDEX_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_index(journal_dir, index):
+    with atomic_file(os.path.join(journal_dir, INDEX_FILE)) as f:
+        json.dump(index, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def _record(site_id, run_id, time_utc, change):
+    r = {"site_id": site_id, "run_id": run_id, "time_utc": time_utc}
+    for k in FIELDS:
+        v = change.get(k)
+        if v is not None and v != "":
+            r[k] = v
+    return r
+
+
+def append_changes(journal_dir, site_id, run_id, time_utc, changes):
+    """Append one run's changes (vs. the previous run); returns records written."""
+    if not changes:
+        return 0
+    day = _day(time_utc)
+    lines = [
+        json.dumps(_record(site_id, run_id, time_utc, c), ensure_ascii=False, separators=(",", ":"))
+        for c in changes
+    ]
+    with _lock:
+        os.makedirs(journal_dir, exist_ok=True)
+        with open(os.path.join(journal_dir, f"{day}.jsonl"), "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        index = _load_index(journal_dir)
+        by_type = index.setdefault(day, {}).setdefault(site_id, {})
+        for c in changes:
+            by_type[c["type"]] = by_type.get(c["type"], 0) + 1
+        _write_index(journal_dir, index)
+    return len(lines)
+
+
+def query(journal_dir, days=14, types=None, site_id=None, now=None):
+    """Journal records from the last `days` days, oldest first.
+
+    types: iterable of change types (e.g. {"PRICE"}); site_id: one site.
+    Days with no matching site/type in the index are never opened."""
+    now = now or datetime.now(timezone.utc)
+    since = (now - timedelta(days=float(days))).replace(microsecond=0).isoformat()
+    types = set(types) if types else None
+    index = _load_index(journal_dir)
+    out = []
+    for day in sorted(index):
+        if day < since[:10]:
+            continue
+        sites = index[day]
+        wanted = [sites.get(site_id, {})] if site_id else sites.values()
+        if not any(n for by_type in wanted for t, n in by_type.items() if types is None or t in types):
+            continue
+        with open(os.path.join(journal_dir, f"{day}.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                r = json.loads(line)
+                if r["time_utc"] < since:
+                    continue
+                if site_id and r["site_id"] != site_id:
+                    continue
+                if types and r["type"] not in types:
+                    continue
+                out.append(r)
+    return out
+
+
+def feed(journal_dir, days=14, limit=500, now=None):
+    """Newest-first slice of the journal for the dashboard, plus per-day counts."""
+    now = now or datetime.now(timezone.utc)
+    records = query(journal_dir, days=days, now=now)
+    since = (now - timedelta(days=float(days))).date().isoformat()
+    index = _load_index(journal_dir)
+    return {
+        "days": days,
+        "total": len(records),
+        "by_day": {d: index[d] for d in sorted(index) if d >= since},
+        "records": records[::-1][:limit],
+    }
+
+
+def prune(journal_dir, keep_days=30, now=None):
+    """Delete journal days older than `keep_days` and drop them from the index; returns the days removed."""
+    now = now or datetime.now(timezone.utc)
+    cutoff = (now - timedelta(days=float(keep_days))).date().isoformat()
+    with _lock:
+        index = _load_index(journal_dir)
+        try:
+            names = os.listdir(journal_dir)
+        except OSError:
+            return []
+        days = sorted({fn[:-len(".jsonl")] for fn in names if fn.endswith(".jsonl")} | set(index))
+        old = [d for d in days if d < cutoff]
+        for d in old:
+            try:
+                os.remove(os.path.join(journal_dir, f"{d}.jsonl"))
+            except FileNotFoundError:
+                pass
+            index.pop(d, None)
+        if old:
+            _write_index(journal_dir, index)
+    return old
+
+
+def backfill(journal_dir, snap_dir):
+    """Rebuild the journal by diffing every stored run against the one before it."""
+    import shutil
+    from diff import diff_sorted
+    from storage import load_index, iter_snapshot_products
+
+    shutil.rmtree(journal_dir, ignore_errors=True)
+    sites = sorted({fn.split("__", 1)[0] for fn in os.listdir(snap_dir) if fn.endswith(".json") and "__" in fn})
+    for site_id in sites:
+        entries = load_index(snap_dir, site_id)
+        n = 0
+        for prev, cur in zip(entries, entries[1:]):
+            changes, _ = diff_sorted(iter_snapshot_products(snap_dir, prev["file"]),
+                                     iter_snapshot_products(snap_dir, cur["file"]))
+            n += append_changes(journal_dir, site_id, cur["run_id"], cur["time_utc"], changes)
+        print(f"  {site_id}: {n} changes over {max(len(entries) - 1, 0)} runs")
+
+
+def main():
+    from run import DOCS_DATA, SNAP_DIR
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dir", default=os.path.join(DOCS_DATA, "journal"))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("backfill")
+    q = sub.add_parser("query")
+    q.add_argument("--days", type=float, default=14)
+    q.add_argument("--type", action="append", help="NEW / PRICE / REMOVED / OOS / RESTOCK (repeatable)")
+    q.add_argument("--site")
+    args = ap.parse_args()
+
+    if args.cmd == "backfill":
+        backfill(args.dir, SNAP_DIR)
+    else:
+        for r in query(args.dir, days=args.days, types=args.type, site_id=args.site):
+            print(json.dumps(r, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Per-run instrumentation (.cache/metrics.json, docs/data/metrics_latest.json).
+
+run_once times each stage of each site with a StageTimer, adds the HTTP
+client's per-host request stats and the snapshot bytes each crawl thread
+read and wrote, and appends one record per run to the history in
+`metrics.history_path` (keeping the newest `metrics.keep_runs`; it lives in
+.cache, not in git). The dashboard only gets metrics_latest.json: the newest
+`metrics.publish_runs` records, with per-site detail for the last one only.
+
+With `python src/run.py --profile` every stage also runs under cProfile and
+tracemalloc: profiles go to <profile_dir>/<run_id>/<site>.<stage>.prof and
+the traced memory peak of each stage goes into the record. cProfile only
+sees the thread running the stage, not the fetchers' worker pools. Profiled
+runs crawl one site at a time so the stages don't overlap.
+"""
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource  # not on Windows
+except ImportError:
+    resource = None
+
+from stats import percentile
+
+_io = threading.local()
+
+
+def add_io(kind, nbytes):
+    """Count snapshot/output bytes ("read" or "written") for the current thread."""
+    setattr(_io, kind, getattr(_io, kind, 0) + int(nbytes))
+
+
+def take_io():
+    """Bytes read/written by this thread since the last call; resets the counters."""
+    out = {"read": getattr(_io, "read", 0), "written": getattr(_io, "written", 0)}
+    _io.read = _io.written = 0
+    return out
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+
+
+class StageTimer:
+    """Wall time per named stage; optionally cProfile + tracemalloc per stage."""
+
+    def __init__(self, profile_dir=None, label="run"):
+        self.profile_dir = profile_dir
+        self.label = label
+        self.seconds = {}
+        self.mem_peak_kb = {}
+        self.extra = {}
+
+    @contextmanager
+    def stage(self, name):
+        prof = None
+        if self.profile_dir:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            prof = cProfile.Profile()
+            prof.enable()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = round(self.seconds.get(name, 0.0) + time.perf_counter() - t0, 4)
+            if prof is not None:
+                prof.disable()
+                os.makedirs(self.profile_dir, exist_ok=True)
+                prof.dump_stats(os.path.join(self.profile_dir, f"{self.label}.{name}.prof"))
+                peak = round(tracemalloc.get_traced_memory()[1] / 1024)
+                self.mem_peak_kb[name] = max(self.mem_peak_kb.get(name, 0), peak)
+
+    def record(self):
+        out = {"stages": dict(self.seconds)}
+        if self.mem_peak_kb:
+            out["mem_peak_kb"] = dict(self.mem_peak_kb)
+        out.update(self.extra)
+        return out
+
+
+def http_summary(by_host, hosts=None):
+    """Fold HttpClient.host_stats() into totals with p50/p95 latency (ms);
+    hosts: only these hostnames (a site's share of the run)."""
+    out = {"requests": 0, "errors": 0, "retries": 0, "throttled": 0, "not_modified": 0,
+           "bytes_wire": 0, "bytes_body": 0, "waited_s": 0.0}
+    latencies = []
+    for host, h in by_host.items():
+        if hosts is not None and host not in hosts:
+            continue
+        for k in out:
+            out[k] += h.get(k, 0)
+        latencies.extend(h.get("latency_ms", ()))
+    out["waited_s"] = round(out["waited_s"], 3)
+    latencies.sort()
+    out["p50_ms"] = percentile(latencies, 50)
+    out["p95_ms"] = percentile(latencies, 95)
+    return out
+
+
+def load_history(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return data if isinstance(data, list) else []
+
+
+def latest(history, n=10):
+    """The newest n records for the dashboard; per-site detail only on the last."""
+    recent = history[-int(n):] if n else []
+    return [{k: v for k, v in r.items() if k != "sites"} for r in recent[:-1]] + recent[-1:]
+
+
+def stop_profiling():
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
@@ -0,0 +1,96 @@
+"""Rewrite docs/data/snapshots into the current storage layout.
+
+    python src/migrate.py [--codec jsonl.gz] [--keyframe-every 24] [--snap-dir PATH]
+
+Every run of every site is replayed in time order through save_snapshot, so
+legacy full-JSON snapshots become keyframes + deltas in the chosen codec.
+The new tree is built next to the old one. Before it is swapped in, every
+rebuilt run is read back and its products compared (by hash) with the
+source run; on any mismatch the old tree is left untouched. Run files that
+can't be read are listed and the old tree is kept as <snap_dir>.old.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+from run import SNAP_DIR, load_config
+from storage import canonical_products, load_index, load_run, save_snapshot
+
+
+def _du(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for fn in files:
+            total += os.path.getsize(os.path.join(root, fn))
+    return total
+
+
+def _digest(products):
+    raw = json.dumps(canonical_products(products), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def migrate(snap_dir, codec, keyframe_every):
+    """Rebuild snap_dir in `codec`; returns the run files that were skipped."""
+    snap_dir = snap_dir.rstrip("/")
+    files = sorted(fn for fn in os.listdir(snap_dir) if fn.endswith(".json") and "__" in fn)
+    sites = sorted({fn.split("__", 1)[0] for fn in files})
+    tmp = snap_dir + ".migrate"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    digests = {}
+    skipped = []
+    runs = 0
+    for site_id in sites:
+        entries = load_index(snap_dir, site_id)
+        indexed = {e["file"] for e in entries}
+        # load_index leaves out files it can't parse
+        skipped += [fn for fn in files if fn.split("__", 1)[0] == site_id and fn not in indexed]
+        for e in entries:
+            try:
+                snap = load_run(snap_dir, e["file"])
+            except Exception as ex:
+                skipped.append(f"{e['file']} ({ex})")
+                continue
+            fname = save_snapshot(tmp, site_id, snap, keyframe_every=keyframe_every, codec=codec)
+            digests[fname] = _digest(snap.get("products"))
+            runs += 1
+        print(f"  {site_id}: {len(load_index(tmp, site_id))} runs")
+
+    rebuilt = sum(len(load_index(tmp, site_id)) for site_id in sites)
+    bad = [fname for fname, d in sorted(digests.items()) if _digest(load_run(tmp, fname).get("products")) != d]
+    if rebuilt != runs or bad:
+        raise SystemExit(f"Migration check failed: replayed {runs} runs, rebuilt {rebuilt}, "
+                         f"{len(bad)} with different products ({', '.join(bad[:5])}). "
+                         f"{snap_dir} is untouched; the rebuilt tree is in {tmp}.")
+
+    before, after = _du(snap_dir), _du(tmp)
+    old = snap_dir + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    os.replace(snap_dir, old)
+    os.replace(tmp, snap_dir)
+    print(f"Migrated {runs} runs to codec={codec}: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+    if skipped:
+        print(f"Skipped {len(skipped)} unreadable run files; the old tree is kept in {old}:")
+        for fn in skipped:
+            print("  " + fn)
+    else:
+        shutil.rmtree(old)
+    return skipped
+
+
+def main():
+    storage_cfg = load_config().get("storage", {}) or {}
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--codec", default=storage_cfg.get("codec", "json"))
+    ap.add_argument("--keyframe-every", type=int, default=int(storage_cfg.get("keyframe_every", 24)))
+    ap.add_argument("--snap-dir", default=SNAP_DIR)
+    args = ap.parse_args()
+    migrate(args.snap_dir, args.codec, args.keyframe_every)
+
+
+if __name__ == "__main__":
+    main()
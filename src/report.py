@@ -1,3 +1,12 @@
+import hashlib
+import json
+import os
+import re
+
+from storage import write_json
+
+# sites.json 只保留首屏需要的字段；明细拆成按内容哈希命名的分片（不可变，可永久缓存）
+DETAIL_FIELDS = ("changes", "bestsellers", "price_buckets_by_category", "price_stats_by_category")
 
 def build_summary(site_results, run_id, time_utc):
     total = {"new": 0, "removed": 0, "price": 0, "restock": 0, "oos": 0}
@@ -20,3 +29,66 @@ def build_summary(site_results, run_id, time_utc):
         "totals": total,
     }
 
+
+
+def _shard_name(prefix, data):
+    raw = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return f"{prefix}.{hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]}.json"
+
+def _slug(s):
+    return re.sub(r"[^A-Za-z0-9_-]+", "-", s or "Other").strip("-") or "x"
+
+def _shard_paths(entry):
+    shards = entry.get("shards") or {}
+    for v in shards.values():
+        if isinstance(v, dict):
+            yield from v.values()
+        elif v:
+            yield v
+
+def write_site_shards(docs_data, site_results, shard_dir="shards", keep=()):
+    """Split site_results into a small index (returned, for sites.json) plus
+    content-hashed shards under docs/data/<shard_dir>/:
+      <site>.<hash>.json                 changes / bestsellers / per-category buckets
+      <site>.products.<cat>.<hash>.json  one product list per category
+      <site>.spark.<hash>.json           price/stock sparklines by product key
+      <site>.prices.<hash>.json          sorted min_price array per category
+    Shards no longer referenced (by site_results or by the index entries in
+    `keep`, e.g. sites the scheduler skipped this run) are removed."""
+    out_dir = os.path.join(docs_data, shard_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    written = {os.path.basename(p) for e in keep for p in _shard_paths(e)}
+
+    def put(prefix, data):
+        name = _shard_name(prefix, data)
+        path = os.path.join(out_dir, name)
+        if not os.path.exists(path):
+            write_json(path, data)
+        written.add(name)
+        return f"{shard_dir}/{name}"
+
+    index = []
+    for s in site_results:
+        site_id = s.get("site_id") or "site"
+        entry = {k: v for k, v in s.items() if k not in DETAIL_FIELDS and k not in ("products_by_category", "sparklines", "sorted_prices_by_category")}
+        entry["change_total"] = len(s.get("changes") or [])
+        entry["bestseller_total"] = len(s.get("bestsellers") or [])
+        detail = {k: s.get(k) for k in DETAIL_FIELDS}
+        entry["shards"] = {
+            "detail": put(_slug(site_id), detail),
+            "products": {
+                cat: put(f"{_slug(site_id)}.products.{_slug(cat)}", items)
+                for cat, items in (s.get("products_by_category") or {}).items()
+            },
+            "sparklines": put(f"{_slug(site_id)}.spark", s.get("sparklines") or {}),
+            "prices": put(f"{_slug(site_id)}.prices", s.get("sorted_prices_by_category") or {}),
+        }
+        index.append(entry)
+
+    for name in os.listdir(out_dir):
+        if name.endswith(".json") and name not in written:
+            try:
+                os.remove(os.path.join(out_dir, name))
+            except OSError:
+                pass
+    return index
@@ -1,17 +1,30 @@
+import argparse
+import json
 import os
 import time
 from datetime import datetime, timezone
 import yaml
 
 from fetchers.shopify import try_fetch_shopify
-from fetchers.generic import fetch_generic_catalog
-from storage import load_latest_snapshot, load_snapshot_days_ago, save_snapshot, prune_snapshots, write_json
-from diff import diff_snapshots
-from report import build_summary
+from fetchers.generic import fetch_generic_catalog, make_parse_pool
+from storage import canonical_products, find_baselines, iter_snapshot_products, load_index, load_latest_snapshot, save_snapshot, prune_snapshots, write_json
+from diff import diff_multi_sorted
+from report import build_summary, write_site_shards
+from crawler import crawl_sites, site_hosts
+from fetchers.transport import HostThrottled, HttpClient
+from fetchers.cache import TtlStore
+from timeseries import append_run, backfill, sparklines
+from journal import append_changes, feed, prune as prune_journal
+from scheduler import due_sites, load_state, scheduler_config, update_state
+from stats import DEFAULT_EDGES, catalog_stats
+from metrics import StageTimer, http_summary, latest, load_history, peak_rss_mb, stop_profiling, take_io
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DOCS_DATA = os.path.join(ROOT, "docs", "data")
 SNAP_DIR = os.path.join(DOCS_DATA, "snapshots")
+# 价格历史不进 git（每轮都会整个重写）：放在 actions/cache 保存的 .cache 里，丢了就从快照重建
+HISTORY_DB = os.path.join(ROOT, ".cache", "history.sqlite")
+JOURNAL_DIR = os.path.join(DOCS_DATA, "journal")
 
 def utc_now_iso():
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
@@ -51,192 +64,415 @@ def _group_products_by_category(products, currency_symbol):
 
     return by
 
-def _bucketize(price, buckets):
-    # buckets: [(0,50),(50,100)..., (200,None)]
-    for lo, hi in buckets:
-        if price is None:
-            return None
-        if hi is None and price >= lo:
-            return f"{lo}+"
-        if hi is not None and lo <= price < hi:
-            return f"{lo}-{hi}"
-    return None
-
-
-def _compute_price_buckets(products):
-    # 用 min_price 做统计（对区间更稳定）
-    buckets = [(0, 50), (50, 100), (100, 150), (150, 200), (200, None)]
-    total = {"0-50": 0, "50-100": 0, "100-150": 0, "150-200": 0, "200+": 0}
-    by_cat = {}
-    for p in products:
-        cat = p.get("category") or "Other"
-        by_cat.setdefault(cat, {"0-50": 0, "50-100": 0, "100-150": 0, "150-200": 0, "200+": 0})
-        price = p.get("min_price")
-        key = _bucketize(price, buckets)
-        if key == "0-50":
-            total["0-50"] += 1;
-            by_cat[cat]["0-50"] += 1
-        elif key == "50-100":
-            total["50-100"] += 1;
-            by_cat[cat]["50-100"] += 1
-        elif key == "100-150":
-            total["100-150"] += 1;
-            by_cat[cat]["100-150"] += 1
-        elif key == "150-200":
-            total["150-200"] += 1;
-            by_cat[cat]["150-200"] += 1
-        elif key == "200+":
-            total["200+"] += 1;
-            by_cat[cat]["200+"] += 1
-    sku_by_cat = {}
-    for p in products:
-        cat = p.get("category") or "Other"
-        sku_by_cat[cat] = sku_by_cat.get(cat, 0) + 1
-    return total, by_cat, sku_by_cat
 
-
-def run_once():
-    ensure_dirs()
-    cfg = load_config()
-    run_id = utc_now_iso().replace(":", "-")
-    errors = []
-    site_results = []
-
-    for site in cfg.get("sites", []):
-        site_id = site["id"]
-        name = site.get("name", site_id)
-        base_url = site["base_url"].rstrip("/")
-        retries = int(site.get("retries", 1))
-
-        baseline_days = cfg.get("schedule", {}).get("baseline_days", 3)
-        baseline = load_snapshot_days_ago(SNAP_DIR, site_id, days=baseline_days)
-        baseline_products = baseline.get("products", []) if baseline else []
-        baseline_time_utc = baseline.get("time_utc") if baseline else None
-
-        fetched = None
-        last_err = None
-
-        # 1) Shopify first (best effort)
-        for attempt in range(retries + 1):
-            try:
-                fetched = try_fetch_shopify(site, cfg)
-                if fetched and fetched.get("products"):
-                    break
-            except Exception as e:
-                last_err = str(e)
-                fetched = None
-            time.sleep(0.8)
-
-        # 2) Fallback: generic fetcher (best effort)
-        if not fetched or not fetched.get("products"):
+def _baseline_windows(cfg):
+    sched = cfg.get("schedule", {})
+    windows = set(sched.get("baseline_windows") or [])
+    windows.add(sched.get("baseline_days", 3))
+    return sorted(windows, key=float)
+
+def _price_edges(site, cfg):
+    # 站点级 price_edges 优先，其次全局 stats.price_edges
+    edges = site.get("price_edges") or (cfg.get("stats", {}) or {}).get("price_edges") or DEFAULT_EDGES
+    return sorted(edges)
+
+def _window_key(days):
+    return f"{days:g}d" if isinstance(days, (int, float)) else f"{days}d"
+
+
+def _run_site(site, cfg, run_id, http=None, profiles=None, timer=None, parse_pool=None):
+    """抓取单个站点并生成 sites.json 条目；返回 (site_result, error 或 None)。
+    站点被限流（Retry-After 超过 retry_after_max）时返回 (None, error)：这一轮跳过，沿用上一轮的条目。
+    profiles: 站点画像的 TtlStore（按 site_id）；timer: StageTimer，记录各阶段耗时（见 metrics.py）；
+    parse_pool: 整轮共用的 generic 解析进程池（见 fetchers/generic.py 的 make_parse_pool）"""
+    site_id = site["id"]
+    name = site.get("name", site_id)
+    base_url = site["base_url"].rstrip("/")
+    retries = int(site.get("retries", 1))
+    timer = timer or StageTimer()
+
+    baseline_days = cfg.get("schedule", {}).get("baseline_days", 3)
+    windows = _baseline_windows(cfg)
+    with timer.stage("baseline"):
+        baselines = find_baselines(SNAP_DIR, site_id, windows)
+        # 上一次运行的快照：用于写变动流水（逐次对比，而不是对比基准）
+        previous = (load_index(SNAP_DIR, site_id) or [None])[-1]
+        # 上一次的完整快照：增量抓取时提供水位线和早停后沿用的商品
+        prev_snapshot = load_latest_snapshot(SNAP_DIR, site_id) if previous else None
+    baseline = baselines.get(baseline_days)
+    baseline_time_utc = baseline.get("time_utc") if baseline else None
+
+    fetched = None
+    last_err = None
+    retried = 0
+
+    # 限速、429/5xx 的重试与退避都在 HttpClient 里按请求处理（见 fetchers/ratelimit.py）；
+    # 单页读坏（响应截断、JSON 坏掉）在 shopify.py 里按页重试；已抓完的列表页记在断点文件里，
+    # 重试或超时后紧接着的重跑从断点继续（断点 1 小时过期，下一次定时运行不会用到）
+    checkpoint_dir = os.path.join(ROOT, (cfg.get("shopify", {}) or {}).get("checkpoint_dir", ".cache/checkpoints"))
+    # 站点画像（platform / 畅销集合 handle）：已知是 generic 的站点直接走 generic，
+    # 失败了再按 Shopify → generic 的顺序重新探测
+    hit, profile = profiles.get(site_id) if profiles is not None else (False, None)
+    profile = dict(profile or {}) if hit else {}
+    strategies = [
+        ("shopify", lambda: try_fetch_shopify(site, cfg, http=http, previous=prev_snapshot, profile=profile,
+                                              checkpoint_dir=checkpoint_dir)),
+        ("generic", lambda: fetch_generic_catalog(site, cfg, http=http, previous=prev_snapshot,
+                                                  parse_pool=parse_pool)),
+    ]
+    if profile.get("platform") == "generic":
+        strategies.reverse()
+
+    platform = None
+    # 明确“不是这种平台”的策略：404，或者 products.json 返回的不是 JSON
+    ruled_out = set()
+    for platform, fetch in strategies:
+        with timer.stage(f"fetch_{platform}"):
             for attempt in range(retries + 1):
+                retried += attempt > 0
                 try:
-                    fetched = fetch_generic_catalog(site, cfg)
+                    fetched = fetch()
                     if fetched and fetched.get("products"):
                         break
+                except HostThrottled as e:
+                    # 服务器要求暂停的时间太长：这一轮不重试、不换 generic，画像也不动
+                    timer.extra["retries"] = retried
+                    timer.extra["platform"] = None
+                    return None, {
+                        "site_id": site_id,
+                        "name": name,
+                        "base_url": base_url,
+                        "run_id": run_id,
+                        "time_utc": utc_now_iso(),
+                        "error": str(e),
+                        "throttled": True,
+                    }
                 except Exception as e:
                     last_err = str(e)
                     fetched = None
-                time.sleep(0.8)
-
-        if not fetched or not fetched.get("products"):
-            # Fail-safe: do not overwrite snapshots; record error only
-            err = {
-                "site_id": site_id,
-                "name": name,
-                "base_url": base_url,
-                "run_id": run_id,
-                "time_utc": utc_now_iso(),
-                "error": last_err or "Fetch failed (no products)",
-            }
-            errors.append(err)
-
-            site_results.append({
-                "site_id": site_id,
-                "name": name,
-                "base_url": base_url,
-                "status": "error",
-                "error": err["error"],
-                "changes": [],
-                "counts": {"new": 0, "removed": 0, "price": 0, "restock": 0, "oos": 0},
-                "baseline_days": baseline_days,
-                "baseline_time_utc": baseline_time_utc,
-            })
-            continue
-
-        snapshot = {
+                    # 404：这个站点根本没有这条路（比如不是 Shopify），重试没有意义
+                    if getattr(getattr(e, "response", None), "status_code", None) == 404 or isinstance(e, ValueError):
+                        ruled_out.add(platform)
+                        break
+        if fetched and fetched.get("products"):
+            break
+    timer.extra["retries"] = retried
+    timer.extra["platform"] = platform if fetched and fetched.get("products") else None
+
+    if profiles is not None:
+        # 只有 Shopify 被明确排除（或画像本来就是 generic）才记成 generic；
+        # Shopify 只是临时出错（5xx、超时）时画像不动，免得 72 小时内 key 在 shopify:* / generic:* 之间来回切
+        ok = bool(fetched and fetched.get("products"))
+        transient = platform == "generic" and "shopify" not in ruled_out and profile.get("platform") != "generic"
+        if ok and not transient:
+            found = dict(profile)
+            found.update(fetched.get("profile") or {})
+            found["platform"] = platform
+            if not hit or found != profile:
+                profiles.put(site_id, found)
+        elif not ok and hit:
+            profiles.drop(site_id)
+
+    if not fetched or not fetched.get("products"):
+        # Fail-safe: do not overwrite snapshots; record error only
+        err = {
             "site_id": site_id,
             "name": name,
             "base_url": base_url,
             "run_id": run_id,
             "time_utc": utc_now_iso(),
-            "products": fetched["products"],
-            "meta": fetched.get("meta", {}),
-            "bestsellers": fetched.get("bestsellers", []),
+            "error": last_err or "Fetch failed (no products)",
         }
-
-        currency_symbol = site.get("currency_symbol") or "€"
-        currency_code = site.get("currency_code") or "EUR"
-
-        pb_total, pb_by_cat, sku_by_cat = _compute_price_buckets(snapshot["products"])
-
-        save_snapshot(SNAP_DIR, site_id, snapshot)
-
-        changes, counts = diff_snapshots(baseline_products, snapshot["products"])
-
-        # 商品状态统计（总SKU/在架/缺货）
-        total_sku = len(snapshot["products"])
-        in_stock = sum(1 for p in snapshot["products"] if p.get("available") is True)
-        oos = sum(1 for p in snapshot["products"] if p.get("available") is False)
-
-        product_status = {
-            "total": total_sku,
-            "in_stock": in_stock,
-            "oos": oos,
-        }
-
-        bestsellers_items = []
-        for p in (snapshot.get("bestsellers") or [])[:20]:
-            bestsellers_items.append({
-                "title": p.get("title"),
-                "variant_label": p.get("variant_label") or "",
-                "min_price": p.get("min_price"),
-                "max_price": p.get("max_price"),
-                "available": p.get("available"),
-                "url": p.get("product_url"),
-            })
-
-        site_results.append({
+        return {
             "site_id": site_id,
             "name": name,
             "base_url": base_url,
-            "status": "ok",
-            "error": "",
-            "currency_symbol": currency_symbol,
-            "currency_code": currency_code,
-            "changes": changes,
-            "counts": counts,
+            "status": "error",
+            "error": err["error"],
+            "changes": [],
+            "counts": {"new": 0, "removed": 0, "price": 0, "restock": 0, "oos": 0},
             "baseline_days": baseline_days,
             "baseline_time_utc": baseline_time_utc,
-            "sku_by_category": sku_by_cat,
-            "price_buckets_total": pb_total,
-            "price_buckets_by_category": pb_by_cat,
-            "products_by_category": _group_products_by_category(snapshot["products"], currency_symbol),
-            "product_total": len(snapshot["products"]),
-            "product_status": product_status,
-            "bestsellers": bestsellers_items,
-        })
-
-    keep = int(cfg.get("schedule", {}).get("keep_snapshots", 40))
-    prune_snapshots(SNAP_DIR, keep_per_site=keep)
+        }, err
+
+    snapshot = {
+        "site_id": site_id,
+        "name": name,
+        "base_url": base_url,
+        "run_id": run_id,
+        "time_utc": utc_now_iso(),
+        "products": fetched["products"],
+        "meta": fetched.get("meta", {}),
+        "bestsellers": fetched.get("bestsellers", []),
+    }
+
+    currency_symbol = site.get("currency_symbol") or "€"
+    currency_code = site.get("currency_code") or "EUR"
+
+    # 统计阶段：先装成列数组，分桶 / 分类计数 / 分位数 / 库存比例都从排好序的价格数组上二分得到
+    price_edges = _price_edges(site, cfg)
+    with timer.stage("stats"):
+        st = catalog_stats(snapshot["products"], edges=price_edges)
+
+    storage_cfg = cfg.get("storage", {}) or {}
+    with timer.stage("snapshot"):
+        save_snapshot(SNAP_DIR, site_id, snapshot,
+                      keyframe_every=int(storage_cfg.get("keyframe_every", 24)),
+                      codec=storage_cfg.get("codec", "json"))
+
+    # 价格/库存时间序列：只记录变化点；顺便导出前端用的 sparkline
+    with timer.stage("history"):
+        append_run(HISTORY_DB, site_id, snapshot["time_utc"], snapshot["products"], run_id=run_id)
+        spark = sparklines(HISTORY_DB, site_id, days=float(storage_cfg.get("sparkline_days", 30)))
+
+    # 多窗口对比：快照按 key 有序存储，直接流式归并对比（不建整表索引）；
+    # 落到同一个快照上的窗口只 diff 一次
+    distinct = {e["file"] for e in list(baselines.values()) + [previous] if e}
+    streams = {f: iter_snapshot_products(SNAP_DIR, f) for f in distinct}
+    streams[None] = []
+    with timer.stage("diff"):
+        # 只有主窗口（页面列出变动）和上一次运行（写流水）要完整的变动列表，其他窗口只要计数
+        full = {baseline["file"] if baseline else None, previous["file"] if previous else None}
+        diffs = diff_multi_sorted(canonical_products(snapshot["products"]), streams, full=full,
+                                  max_in_memory=int(storage_cfg.get("diff_sort_buffer", 20000)))
+    changes, counts = diffs[baseline["file"] if baseline else None]
+    run_changes = diffs[previous["file"]][0] if previous else []
+    if previous:
+        with timer.stage("journal"):
+            append_changes(JOURNAL_DIR, site_id, run_id, snapshot["time_utc"], run_changes)
+    window_results = {}
+    for w in windows:
+        e = baselines.get(w)
+        window_results[_window_key(w)] = {
+            "days": w,
+            "baseline_time_utc": e.get("time_utc") if e else None,
+            "counts": diffs[e["file"] if e else None][1],
+        }
 
-    summary = build_summary(site_results, run_id=run_id, time_utc=utc_now_iso())
+    with timer.stage("group"):
+        products_by_category = _group_products_by_category(snapshot["products"], currency_symbol)
+    timer.extra["products"] = len(snapshot["products"])
 
-    write_json(os.path.join(DOCS_DATA, "summary.json"), summary)
-    write_json(os.path.join(DOCS_DATA, "sites.json"), site_results)
-    write_json(os.path.join(DOCS_DATA, "errors.json"), errors)
+    bestsellers_items = []
+    for p in (snapshot.get("bestsellers") or [])[:20]:
+        bestsellers_items.append({
+            "title": p.get("title"),
+            "variant_label": p.get("variant_label") or "",
+            "min_price": p.get("min_price"),
+            "max_price": p.get("max_price"),
+            "available": p.get("available"),
+            "url": p.get("product_url"),
+        })
 
-    print("Done. Sites:", len(site_results), "Errors:", len(errors))
+    return {
+        "site_id": site_id,
+        "name": name,
+        "base_url": base_url,
+        "status": "ok",
+        "error": "",
+        "crawled_utc": snapshot["time_utc"],
+        "run_change_total": len(run_changes),
+        "currency_symbol": currency_symbol,
+        "currency_code": currency_code,
+        "changes": changes,
+        "counts": counts,
+        "baseline_days": baseline_days,
+        "baseline_time_utc": baseline_time_utc,
+        "windows": window_results,
+        "sku_by_category": st["sku_by_category"],
+        "price_edges": price_edges,
+        "price_buckets_total": st["price_buckets_total"],
+        "price_buckets_by_category": st["price_buckets_by_category"],
+        "price_stats_total": st["price_stats_total"],
+        "price_stats_by_category": st["price_stats_by_category"],
+        "sorted_prices_by_category": st["sorted_prices_by_category"],
+        "products_by_category": products_by_category,
+        "product_total": len(snapshot["products"]),
+        "product_status": st["product_status"],
+        "bestsellers": bestsellers_items,
+        "sparklines": spark,
+    }, None
+
+
+def _load_site_index():
+    try:
+        with open(os.path.join(DOCS_DATA, "sites.json"), "r", encoding="utf-8") as f:
+            return {e.get("site_id"): e for e in json.load(f)}
+    except (OSError, ValueError):
+        return {}
+
+def run_once(force=False, profile=False):
+    t_start = time.perf_counter()
+    ensure_dirs()
+    cfg = load_config()
+    run_id = utc_now_iso().replace(":", "-")
+    sched = cfg.get("schedule", {})
+    http_cfg = cfg.get("http", {}) or {}
+    sites = cfg.get("sites", [])
+
+    # 运行指标：每个站点一个 StageTimer；--profile 时每个阶段另存 cProfile + tracemalloc
+    metrics_cfg = cfg.get("metrics", {}) or {}
+    profile = profile or bool(metrics_cfg.get("profile", False))
+    profile_dir = os.path.join(ROOT, metrics_cfg.get("profile_dir", ".cache/profile"), run_id) if profile else None
+    run_timer = StageTimer(profile_dir, label="run")
+
+    # 自适应调度：只抓到期的站点；没到期的沿用上一轮 sites.json 里的条目
+    sc = scheduler_config(cfg)
+    state_path = os.path.join(DOCS_DATA, "schedule.json")
+    state = load_state(state_path)
+    previous_index = _load_site_index()
+    due = list(sites) if force else due_sites(sites, state, sc)[0]
+    # 新加入（sites.json 里还没有条目）的站点必须抓
+    due_ids = {s["id"] for s in due} | {s["id"] for s in sites if s["id"] not in previous_index}
+    due = [s for s in sites if s["id"] in due_ids]
+    skipped = [s for s in sites if s["id"] not in due_ids]
+
+    http = HttpClient(
+        pool_connections=int(http_cfg.get("pool_connections", 10)),
+        pool_maxsize=int(http_cfg.get("pool_maxsize", 10)),
+        cache_dir=os.path.join(ROOT, http_cfg.get("cache_dir", ".cache/http")),
+        cache_max_age_days=float(http_cfg.get("cache_max_age_days", 14)),
+        rate_per_sec=float(http_cfg.get("rate_per_sec", 0)),
+        burst=int(http_cfg.get("burst", 1)),
+        max_retries=int(http_cfg.get("max_retries", 3)),
+        backoff_base=float(http_cfg.get("backoff_base_sec", 0.5)),
+        backoff_max=float(http_cfg.get("backoff_max_sec", 30)),
+        retry_after_max=float(http_cfg.get("retry_after_max_sec", 120)),
+    )
+    # 站点可以单独设置限速（rate_per_sec / burst），对站点用到的每个 host 生效（分类页可能在别的域名上）
+    for s in due:
+        if "rate_per_sec" in s or "burst" in s:
+            for host in site_hosts(s):
+                http.limiter.configure(host, rate=s.get("rate_per_sec"), burst=s.get("burst"))
+    # 站点画像：哪个抓取方式能用、畅销集合 handle（含“没有”）；过期或抓取失败后重新探测
+    profiles_cfg = cfg.get("profiles", {}) or {}
+    profiles = TtlStore(os.path.join(ROOT, profiles_cfg.get("path", ".cache/site_profiles.json")),
+                        ttl_hours=float(profiles_cfg.get("ttl_hours", 72)))
+
+    if due and not os.path.exists(HISTORY_DB):
+        print("Rebuilding price history from snapshots:", os.path.relpath(HISTORY_DB, ROOT))
+        with run_timer.stage("history_rebuild"):
+            backfill(HISTORY_DB, SNAP_DIR)
+
+    site_timers = {s["id"]: StageTimer(profile_dir, label=s["id"]) for s in due}
+
+    def _site(site):
+        timer = site_timers[site["id"]]
+        take_io()  # 丢掉这个线程之前累计的读写量
+        t0 = time.perf_counter()
+        out = _run_site(site, cfg, run_id, http=http, profiles=profiles, timer=timer, parse_pool=parse_pool)
+        timer.extra["wall_s"] = round(time.perf_counter() - t0, 3)
+        io = take_io()
+        timer.extra["snapshot_bytes_read"] = io["read"]
+        timer.extra["snapshot_bytes_written"] = io["written"]
+        return out
+
+    # 并发抓取：全局并发上限 + 每个 host 的并发上限；结果按 config 顺序合并
+    # （profile 时逐个站点跑，阶段之间不重叠）
+    # generic 解析进程池整轮只建一次（spawn 启动慢），所有 generic 站点共用
+    t_crawl = time.perf_counter()
+    parse_pool = make_parse_pool(cfg)
+    try:
+        results = crawl_sites(
+            due,
+            _site,
+            max_workers=1 if profile else int(sched.get("concurrency", 4)),
+            per_host=int(sched.get("per_host_concurrency", 1)),
+        )
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown(wait=False, cancel_futures=True)
+    run_timer.seconds["crawl"] = round(time.perf_counter() - t_crawl, 4)
+    site_results = [r for r, _ in results if r is not None]
+    errors = [e for _, e in results if e]
+    # 被限流跳过的站点和没到期的一样处理：沿用上一轮的条目，调度状态不更新（下一轮照样到期）
+    throttled = [s for s, (r, _) in zip(due, results) if r is None]
+
+    take_io()
+    keep = int(cfg.get("schedule", {}).get("keep_snapshots", 40))
+    with run_timer.stage("prune"):
+        # keep_snapshots 是下限：最长对比窗口的基准快照及之后的运行一律保留（一天最多 12 次运行时 300 份不够 30 天）
+        prune_snapshots(SNAP_DIR, keep_per_site=keep, codec=(cfg.get("storage", {}) or {}).get("codec", "json"),
+                        keep_days=max(float(w) for w in _baseline_windows(cfg)))
+
+    http_stats = http.stats()
+    host_stats = http.host_stats()
+    http.close()
+    http.cache.prune()
+
+    with run_timer.stage("report"):
+        carried = [dict(previous_index[s["id"]], skipped=True) for s in skipped + throttled
+                   if s["id"] in previous_index]
+        fresh = {e["site_id"]: e for e in write_site_shards(DOCS_DATA, site_results, keep=carried)}
+        carried_by_id = {e["site_id"]: e for e in carried}
+        index = [fresh.get(s["id"]) or carried_by_id[s["id"]] for s in sites
+                 if s["id"] in fresh or s["id"] in carried_by_id]
+
+        update_state(state, sites, {r["site_id"]: r for r in site_results}, sc, JOURNAL_DIR)
+        write_json(state_path, state)
+
+        summary = build_summary(index, run_id=run_id, time_utc=utc_now_iso())
+        summary["http"] = http_stats
+        summary["sites_crawled"] = len(site_results)
+        summary["sites_skipped"] = len(skipped)
+        summary["sites_throttled"] = len(throttled)
+
+        write_json(os.path.join(DOCS_DATA, "summary.json"), summary)
+        write_json(os.path.join(DOCS_DATA, "sites.json"), index)
+        write_json(os.path.join(DOCS_DATA, "errors.json"), errors)
+    with run_timer.stage("feed"):
+        journal_cfg = cfg.get("journal", {}) or {}
+        feed_days = float(journal_cfg.get("feed_days", 14))
+        # 日志只保留 keep_days 天（至少覆盖 feed_days），过期的日期文件和 index.json 条目一起删
+        prune_journal(JOURNAL_DIR, keep_days=max(float(journal_cfg.get("keep_days", 30)), feed_days))
+        write_json(os.path.join(DOCS_DATA, "feed.json"),
+                   feed(JOURNAL_DIR, days=feed_days, limit=int(journal_cfg.get("feed_limit", 500))))
+
+    # 运行指标：完整历史（最近 keep_runs 条）在 .cache 里，不进 git；页面只拿最近 publish_runs 条（metrics_latest.json）
+    site_metrics = {}
+    hosts_by_id = {s["id"]: site_hosts(s) for s in due}
+    status_by_id = {r["site_id"]: r.get("status") for r in site_results}
+    status_by_id.update((s["id"], "throttled") for s in throttled)
+    for site_id, status in status_by_id.items():
+        m = site_timers[site_id].record()
+        m["status"] = status
+        m["http"] = http_summary(host_stats, hosts=hosts_by_id.get(site_id, set()))
+        site_metrics[site_id] = m
+    record = {
+        "run_id": run_id,
+        "time_utc": summary["time_utc"],
+        "wall_s": round(time.perf_counter() - t_start, 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "sites_crawled": len(site_results),
+        "sites_skipped": len(skipped),
+        "sites_throttled": len(throttled),
+        "errors": len(errors),
+        "http": http_summary(host_stats),
+        "output_bytes_written": take_io()["written"],
+        **run_timer.record(),
+        "sites": site_metrics,
+    }
+    if profile_dir:
+        record["profile_dir"] = os.path.relpath(profile_dir, ROOT)
+    history_path = os.path.join(ROOT, metrics_cfg.get("history_path", ".cache/metrics.json"))
+    history = (load_history(history_path) + [record])[-int(metrics_cfg.get("keep_runs", 200)):]
+    write_json(history_path, history)
+    write_json(os.path.join(DOCS_DATA, "metrics_latest.json"), latest(history, int(metrics_cfg.get("publish_runs", 10))))
+    stop_profiling()
+
+    print("Done. Sites:", len(site_results), "Skipped:", len(skipped), "Errors:", len(errors))
+    print("HTTP: requests={requests} connections_opened={connections_opened} "
+          "reused={connections_reused} not_modified={not_modified} "
+          "bytes_wire={bytes_wire} bytes_body={bytes_body}".format(**http_stats))
+    print("Time: {:.1f}s ({}) p50={} ms p95={} ms peak_rss={} MB".format(
+        record["wall_s"], " ".join(f"{k}={v:.1f}s" for k, v in record["stages"].items()),
+        record["http"]["p50_ms"] or "-", record["http"]["p95_ms"] or "-", record["peak_rss_mb"] or "-"))
+    if profile_dir:
+        print("Profiles:", record["profile_dir"])
 
 if __name__ == "__main__":
-    run_once()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--all", action="store_true", help="crawl every site, ignoring the adaptive schedule")
+    ap.add_argument("--profile", action="store_true", help="cProfile + tracemalloc per stage (see metrics.py)")
+    args = ap.parse_args()
+    run_once(force=args.all, profile=args.profile)
@@ -0,0 +1,144 @@
+"""Adaptive per-site crawl schedule (docs/data/schedule.json).
+
+Each invocation crawls only the sites that are due. A site's interval comes
+from its recent change rate in the change journal (changes/day over
+`lookback_days`, target = max_interval_hours / (1 + rate)) and from whether
+the last run found anything: empty runs back the interval off by `backoff`
+up to max_interval_hours, runs with changes pull it back down to the target
+(never below min_interval_hours). Failed sites are retried after min_interval_hours.
+
+    python src/scheduler.py            # print the plan; writes due=<n> to $GITHUB_OUTPUT
+"""
+import json
+import os
+from datetime import datetime, timezone, timedelta
+
+DEFAULTS = {
+    "enabled": True,
+    "min_interval_hours": 2,
+    "max_interval_hours": 24,
+    "backoff": 2.0,
+    "lookback_days": 7,
+    "grace_hours": 0.5,
+}
+
+
+def scheduler_config(cfg):
+    out = dict(DEFAULTS)
+    out.update(cfg.get("scheduler", {}) or {})
+    return out
+
+
+def _site_limits(site, sc):
+    lo = float(site.get("min_interval_hours", sc["min_interval_hours"]))
+    hi = float(site.get("max_interval_hours", sc["max_interval_hours"]))
+    return lo, max(lo, hi)
+
+
+def _parse(ts):
+    return datetime.fromisoformat(ts) if ts else None
+
+
+def load_state(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def change_rates(journal_dir, days, now):
+    """{site_id: changes per day} over the last `days` days of the journal index."""
+    try:
+        with open(os.path.join(journal_dir, "index.json"), "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    since = (now - timedelta(days=float(days))).date().isoformat()
+    totals = {}
+    for day, sites in index.items():
+        if day < since:
+            continue
+        for site_id, by_type in sites.items():
+            totals[site_id] = totals.get(site_id, 0) + sum(by_type.values())
+    return {s: n / float(days) for s, n in totals.items()}
+
+
+def next_interval(site, sc, prev_interval, rate_per_day, last_changes):
+    """Hours until the site is due again: start at the minimum, grow by
+    `backoff` after an empty run, and after a run with changes drop to the
+    rate-based target (or prev / backoff, whichever is shorter)."""
+    lo, hi = _site_limits(site, sc)
+    backoff = float(sc["backoff"])
+    target = hi / (1.0 + rate_per_day)
+    if not prev_interval:
+        interval = lo
+    elif last_changes:
+        interval = min(target, prev_interval / backoff)
+    else:
+        interval = prev_interval * backoff
+    return round(min(hi, max(lo, interval)), 2)
+
+
+def due_sites(sites, state, sc, now=None):
+    """Split config sites into (due, skipped) for this invocation."""
+    now = now or datetime.now(timezone.utc)
+    if not sc.get("enabled", True):
+        return list(sites), []
+    grace = timedelta(hours=float(sc["grace_hours"]))
+    due, skipped = [], []
+    for site in sites:
+        st = state.get(site["id"]) or {}
+        last = _parse(st.get("last_run_utc"))
+        interval = timedelta(hours=float(st.get("interval_hours") or 0))
+        if last is None or now - last >= interval - grace:
+            due.append(site)
+        else:
+            skipped.append(site)
+    return due, skipped
+
+
+def update_state(state, sites, results, sc, journal_dir, now=None):
+    """Record this invocation's crawls. results: {site_id: site_result}."""
+    now = now or datetime.now(timezone.utc)
+    rates = change_rates(journal_dir, sc["lookback_days"], now)
+    by_id = {s["id"]: s for s in sites}
+    for site_id, r in results.items():
+        site = by_id.get(site_id, {})
+        prev = state.get(site_id) or {}
+        st = {"last_run_utc": now.replace(microsecond=0).isoformat(), "status": r.get("status")}
+        if r.get("status") == "ok":
+            rate = rates.get(site_id, 0.0)
+            st["rate_per_day"] = round(rate, 2)
+            st["last_changes"] = r.get("run_change_total", 0)
+            st["interval_hours"] = next_interval(site, sc, prev.get("interval_hours"), rate, st["last_changes"])
+            st["last_ok_utc"] = st["last_run_utc"]
+        else:
+            st["interval_hours"] = _site_limits(site, sc)[0]
+            st["rate_per_day"] = prev.get("rate_per_day", 0.0)
+            st["last_ok_utc"] = prev.get("last_ok_utc")
+        state[site_id] = st
+    return state
+
+
+def main():
+    from run import DOCS_DATA, load_config
+
+    cfg = load_config()
+    sc = scheduler_config(cfg)
+    state = load_state(os.path.join(DOCS_DATA, "schedule.json"))
+    now = datetime.now(timezone.utc)
+    due, skipped = due_sites(cfg.get("sites", []), state, sc, now)
+    for site in cfg.get("sites", []):
+        st = state.get(site["id"]) or {}
+        mark = "due " if site in due else "skip"
+        print(f"{mark} {site['id']:<12} interval={st.get('interval_hours', '-')}h "
+              f"last={st.get('last_run_utc', '-')} rate={st.get('rate_per_day', '-')}/day")
+    out = os.environ.get("GITHUB_OUTPUT")
+    if out:
+        with open(out, "a", encoding="utf-8") as f:
+            f.write(f"due={len(due)}\n")
+
+
+if __name__ == "__main__":
+    main()
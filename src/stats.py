@@ -0,0 +1,125 @@
+"""Catalog statistics over column arrays.
+
+A catalog is loaded once into parallel arrays (price, category code,
+availability); per-category sorted price arrays are built from those, and
+bucket histograms and percentiles are binary searches / index lookups on them.
+"""
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+DEFAULT_EDGES = (0, 50, 100, 150, 200)
+PERCENTILES = (10, 25, 50, 75, 90)
+
+NAN = float("nan")
+
+
+def _edge_text(x):
+    # Same text as JS `${x}` so the dashboard can rebuild the keys from edges
+    return str(int(x)) if float(x).is_integer() else repr(float(x))
+
+
+def bucket_labels(edges):
+    edges = [_edge_text(e) for e in edges]
+    labels = [f"{lo}-{hi}" for lo, hi in zip(edges, edges[1:])]
+    labels.append(f"{edges[-1]}+")
+    return labels
+
+
+def load_columns(products):
+    """products -> (prices array('d', NaN = unknown), category codes array('H'),
+    availability array('b', 1/0/-1 unknown), category names)."""
+    prices = array("d")
+    cats = array("H")
+    avail = array("b")
+    names = []
+    codes = {}
+    for p in products or []:
+        price = p.get("min_price")
+        prices.append(NAN if price is None else float(price))
+        cat = p.get("category") or "Other"
+        code = codes.get(cat)
+        if code is None:
+            code = codes[cat] = len(names)
+            names.append(cat)
+        cats.append(code)
+        a = p.get("available")
+        avail.append(1 if a is True else 0 if a is False else -1)
+    return prices, cats, avail, names
+
+
+def percentile(sorted_prices, q):
+    """Linear-interpolated percentile of an already sorted sequence."""
+    n = len(sorted_prices)
+    if not n:
+        return None
+    pos = (n - 1) * q / 100.0
+    i = int(pos)
+    if i + 1 >= n:
+        return sorted_prices[-1]
+    return round(sorted_prices[i] + (sorted_prices[i + 1] - sorted_prices[i]) * (pos - i), 2)
+
+
+def _summary(sorted_prices, total, in_stock, oos):
+    return {
+        "count": total,
+        "priced": len(sorted_prices),
+        "min": sorted_prices[0] if sorted_prices else None,
+        "max": sorted_prices[-1] if sorted_prices else None,
+        "percentiles": {f"p{q}": percentile(sorted_prices, q) for q in PERCENTILES},
+        "in_stock": in_stock,
+        "oos": oos,
+        "in_stock_ratio": round(in_stock / total, 4) if total else None,
+    }
+
+
+def sorted_prices_by_category(prices, cats, ncat):
+    """One sorted array('d') of known prices per category code."""
+    by = [[] for _ in range(ncat)]
+    for c, x in zip(cats, prices):
+        if x == x:
+            by[c].append(x)
+    return [array("d", sorted(xs)) for xs in by]
+
+
+def histogram(sorted_prices, edges):
+    """Counts per bucket [e0,e1) ... [en,inf) via binary search on a sorted array."""
+    cuts = [bisect_left(sorted_prices, e) for e in edges] + [len(sorted_prices)]
+    return [hi - lo for lo, hi in zip(cuts, cuts[1:])]
+
+
+def catalog_stats(products, edges=DEFAULT_EDGES):
+    """Everything the dashboard needs about a catalog's prices and stock.
+
+    Returns bucket histograms (total / by category, keyed by
+    bucket_labels(edges)), sku_by_category, product_status and percentile
+    summaries (total / by category), plus the sorted price arrays themselves
+    so later histogram / percentile / range queries need no rescan."""
+    edges = sorted(edges)
+    labels = bucket_labels(edges)
+    prices, cats, avail, names = load_columns(products)
+    ncat = len(names)
+
+    sorted_by_cat = sorted_prices_by_category(prices, cats, ncat)
+    sorted_total = array("d", sorted(x for x in prices if x == x))
+    sku = Counter(cats)
+    stock = Counter(zip(cats, avail))
+    in_stock = [stock[(c, 1)] for c in range(ncat)]
+    oos = [stock[(c, 0)] for c in range(ncat)]
+
+    total = len(prices)
+    return {
+        "edges": edges,
+        "labels": labels,
+        "price_buckets_total": dict(zip(labels, histogram(sorted_total, edges))),
+        "price_buckets_by_category": {
+            names[c]: dict(zip(labels, histogram(sorted_by_cat[c], edges))) for c in range(ncat)
+        },
+        "sku_by_category": {names[c]: sku[c] for c in range(ncat)},
+        "product_status": {"total": total, "in_stock": sum(in_stock), "oos": sum(oos)},
+        "price_stats_total": _summary(sorted_total, total, sum(in_stock), sum(oos)),
+        "price_stats_by_category": {
+            names[c]: _summary(sorted_by_cat[c], sku[c], in_stock[c], oos[c]) for c in range(ncat)
+        },
+        "sorted_prices_by_category": {names[c]: sorted_by_cat[c].tolist() for c in range(ncat)},
+    }
@@ -1,15 +1,23 @@
 
+import hashlib
 import json
 import os
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
 from glob import glob
 from datetime import datetime, timezone, timedelta
 
+from codec import CODECS, atomic_file, get_codec
+from diff import delta_products, apply_delta
+from metrics import add_io
+
+INDEX_DIR = "_index"
+OBJECTS_DIR = "objects"
+
 def write_json(path, data):
-    tmp = path + ".tmp"
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(tmp, "w", encoding="utf-8") as f:
+    with atomic_file(path) as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, path)
+    add_io("written", os.path.getsize(path))
 
 def _site_glob(snap_dir, site_id):
     return os.path.join(snap_dir, f"{site_id}__*.json")
@@ -18,73 +26,304 @@ def load_latest_snapshot(snap_dir, site_id):
     files = sorted(glob(_site_glob(snap_dir, site_id)))
     if not files:
         return None
-    latest = files[-1]
-    with open(latest, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_run(snap_dir, os.path.basename(files[-1]))
 
-def load_snapshot_days_ago(snap_dir, site_id, days=3):
-    """Return the latest snapshot whose time_utc is <= (now - days).
-    If no such snapshot exists, fall back to the latest snapshot.
-    """
-    files = sorted(glob(_site_glob(snap_dir, site_id)))
-    if not files:
-        return None
+def _parse_time(t_raw):
+    t = datetime.fromisoformat(t_raw)
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=timezone.utc)
+    return t
 
-    cutoff = datetime.now(timezone.utc) - timedelta(days=float(days))
+def canonical_products(products):
+    """Products sorted by key: the order snapshots are stored and streamed in."""
+    return sorted(products or [], key=lambda p: p.get("key") or "")
 
-    best = None
-    best_t = None
+def _json_hash(data):
+    raw = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
-    for fpath in files:
-        try:
-            with open(fpath, "r", encoding="utf-8") as f:
-                snap = json.load(f)
-            t_raw = snap.get("time_utc")
-            if not t_raw:
-                continue
-            t = datetime.fromisoformat(t_raw)
-            if t.tzinfo is None:
-                t = t.replace(tzinfo=timezone.utc)
+def _content_hash(products):
+    return _json_hash(canonical_products(products))
 
-            if t <= cutoff and (best_t is None or t > best_t):
-                best = snap
-                best_t = t
-        except Exception:
+# ---- content-addressed payloads: snapshots/objects/ab/abcdef....<codec ext> ----
+# A run file keeps only metadata + "products_ref" (or "delta_ref"); identical
+# payloads share one object. The codec is chosen per deployment (storage.codec);
+# readers accept objects written with any known codec.
+
+def _object_path(snap_dir, h, codec):
+    return os.path.join(snap_dir, OBJECTS_DIR, h[:2], f"{h}{codec.ext}")
+
+def _find_object(snap_dir, h):
+    for codec in CODECS.values():
+        path = _object_path(snap_dir, h, codec)
+        if os.path.exists(path):
+            return path, codec
+    raise FileNotFoundError(f"snapshot object {h} not found")
+
+def _put_object(snap_dir, records, h, codec="json"):
+    # Objects are immutable: whoever finds one already there (possibly written
+    # a moment ago by another site's thread) is done.
+    try:
+        _find_object(snap_dir, h)
+        return h
+    except FileNotFoundError:
+        pass
+    codec = get_codec(codec)
+    path = _object_path(snap_dir, h, codec)
+    codec.write(path, records)
+    add_io("written", os.path.getsize(path))
+    return h
+
+def _iter_object(snap_dir, h):
+    path, codec = _find_object(snap_dir, h)
+    add_io("read", os.path.getsize(path))
+    yield from codec.iter(path)
+
+def _load_object(snap_dir, h):
+    return list(_iter_object(snap_dir, h))
+
+def _gc_objects(snap_dir, referenced):
+    for path in glob(os.path.join(snap_dir, OBJECTS_DIR, "*", "*")):
+        h = os.path.basename(path).split(".", 1)[0]
+        if h not in referenced:
+            try:
+                os.remove(path)
+            except Exception:
+                pass
+
+# ---- delta history ----
+# Between keyframes a run file stores {"base": <previous run file>, "delta_ref": ...}
+# instead of products_ref; the full state is rebuilt from the nearest keyframe.
+# Delta objects are stored as one record per operation.
+
+def _delta_records(delta):
+    for p in delta["added"]:
+        yield {"op": "add", "product": p}
+    for k in delta["removed"]:
+        yield {"op": "remove", "key": k}
+    for k, fields in delta["changed"].items():
+        yield {"op": "change", "key": k, "fields": fields}
+    for k, fields in delta["unset"].items():
+        yield {"op": "unset", "key": k, "fields": fields}
+
+def _delta_from_records(records):
+    delta = {"added": [], "removed": [], "changed": {}, "unset": {}}
+    for r in records:
+        op = r["op"]
+        if op == "add":
+            delta["added"].append(r["product"])
+        elif op == "remove":
+            delta["removed"].append(r["key"])
+        elif op == "change":
+            delta["changed"][r["key"]] = r["fields"]
+        elif op == "unset":
+            delta["unset"][r["key"]] = r["fields"]
+    return delta
+
+def _is_delta(record):
+    return "delta_ref" in record or "delta" in record
+
+def _delta_of(snap_dir, record):
+    if "delta" in record:
+        return record["delta"]
+    return _delta_from_records(_iter_object(snap_dir, record["delta_ref"]))
+
+def _read_record(snap_dir, fname):
+    path = os.path.join(snap_dir, fname)
+    add_io("read", os.path.getsize(path))
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+@lru_cache(maxsize=32)
+def _rebuild(snap_dir, fname, mtime_ns):
+    record = _read_record(snap_dir, fname)
+    if "products_ref" in record:
+        return tuple(_load_object(snap_dir, record["products_ref"]))
+    if _is_delta(record):
+        base = _state(snap_dir, record["base"])
+        return tuple(canonical_products(apply_delta(base, _delta_of(snap_dir, record))))
+    return tuple(canonical_products(record.get("products")))
+
+def _state(snap_dir, fname):
+    """Products of a run (canonical order), via an LRU cache of rebuilt states.
+    The tuple is shared with the cache: copy before mutating."""
+    mtime_ns = os.stat(os.path.join(snap_dir, fname)).st_mtime_ns
+    return _rebuild(snap_dir, fname, mtime_ns)
+
+def _unique_keys(products):
+    # Deltas are keyed by product key; catalogs with duplicate keys are stored whole
+    return len({p.get("key") for p in products}) == len(products)
+
+def _apply_delta_sorted(base_iter, delta):
+    """Streaming apply_delta over a key-sorted product stream."""
+    removed = set(delta["removed"])
+    changed = delta["changed"]
+    unset = delta["unset"]
+    added = canonical_products(delta["added"])
+    i = 0
+    for p in base_iter:
+        k = p.get("key") or ""
+        while i < len(added) and (added[i].get("key") or "") < k:
+            yield added[i]
+            i += 1
+        if k in removed:
             continue
+        if k in changed or k in unset:
+            p = dict(p)
+            p.update(changed.get(k, {}))
+            for f in unset.get(k, []):
+                p.pop(f, None)
+        yield p
+    yield from added[i:]
+
+def iter_snapshot_products(snap_dir, fname):
+    """Stream a run's products in key order without materialising the catalog
+    (keyframe objects are read record by record; deltas are merged on the fly)."""
+    record = _read_record(snap_dir, fname)
+    if "products_ref" in record:
+        yield from _iter_object(snap_dir, record["products_ref"])
+    elif _is_delta(record):
+        yield from _apply_delta_sorted(iter_snapshot_products(snap_dir, record["base"]), _delta_of(snap_dir, record))
+    else:
+        yield from canonical_products(record.get("products"))
+
+_RUN_ONLY_FIELDS = ("base", "delta", "delta_ref", "content_hash", "products_ref", "product_count", "products")
+
+def _keyframe_record(snap_dir, record, canonical, h, codec="json"):
+    record = {k: v for k, v in record.items() if k not in _RUN_ONLY_FIELDS}
+    record["products_ref"] = _put_object(snap_dir, canonical, h, codec)
+    record["product_count"] = len(canonical)
+    return record
+
+# ---- per-site manifest: snapshots/_index/{site_id}.json ----
+# [{run_id, time_utc, file, products, hash, keyframe}, ...] sorted by time_utc
+
+def _index_path(snap_dir, site_id):
+    return os.path.join(snap_dir, INDEX_DIR, f"{site_id}.json")
 
-    if best is not None:
-        return best
-    
-    # Fallback (history < days): use the earliest snapshot as baseline
-    oldest = None
-    oldest_t = None
-    
-    for fpath in files:
+def _index_entry(fname, snap):
+    keyframe = not _is_delta(snap)
+    ref = snap.get("products_ref") or snap.get("delta_ref")
+    if "products_ref" in snap:
+        count, h = snap.get("product_count", 0), snap["products_ref"]
+    elif not keyframe:
+        count, h = snap.get("product_count", 0), snap["content_hash"]
+    else:
+        products = snap.get("products", []) or []
+        count, h = len(products), _content_hash(products)
+    return {
+        "run_id": snap.get("run_id"),
+        "time_utc": snap.get("time_utc"),
+        "file": fname,
+        "products": count,
+        "hash": h,
+        "keyframe": keyframe,
+        "ref": ref,
+    }
+
+def _sort_entries(entries):
+    entries.sort(key=lambda e: (_parse_time(e["time_utc"]), e["file"]))
+    return entries
+
+def _write_index(snap_dir, site_id, entries):
+    write_json(_index_path(snap_dir, site_id), _sort_entries(entries))
+
+def load_index(snap_dir, site_id):
+    """Manifest of a site's snapshots, sorted by time_utc.
+    Entries for files that appeared/disappeared behind our back are reconciled
+    (only new files are opened), so a missing manifest is rebuilt once."""
+    files = {os.path.basename(f) for f in glob(_site_glob(snap_dir, site_id))}
+    try:
+        with open(_index_path(snap_dir, site_id), "r", encoding="utf-8") as f:
+            entries = json.load(f)
+            add_io("read", os.fstat(f.fileno()).st_size)
+    except Exception:
+        entries = []
+
+    known = {e["file"] for e in entries}
+    if known == files:
+        return entries
+
+    entries = [e for e in entries if e["file"] in files]
+    for fname in sorted(files - known):
         try:
-            with open(fpath, "r", encoding="utf-8") as f:
+            with open(os.path.join(snap_dir, fname), "r", encoding="utf-8") as f:
                 snap = json.load(f)
-            t_raw = snap.get("time_utc")
-            if not t_raw:
+            if not snap.get("time_utc"):
                 continue
-            t = datetime.fromisoformat(t_raw)
-            if t.tzinfo is None:
-                t = t.replace(tzinfo=timezone.utc)
-    
-            if oldest_t is None or t < oldest_t:
-                oldest = snap
-                oldest_t = t
+            _parse_time(snap["time_utc"])
         except Exception:
             continue
-    
-    return oldest or load_latest_snapshot(snap_dir, site_id)
+        entries.append(_index_entry(fname, snap))
+    _write_index(snap_dir, site_id, entries)
+    return entries
+
+def load_run(snap_dir, fname):
+    """Load a run file with its products resolved (object pointer or delta chain)."""
+    snap = _read_record(snap_dir, fname)
+    if "products_ref" in snap or _is_delta(snap):
+        snap = {k: v for k, v in snap.items() if k not in _RUN_ONLY_FIELDS}
+        snap["products"] = [dict(p) for p in _state(snap_dir, fname)]
+    return snap
 
+def find_baselines(snap_dir, site_id, windows):
+    """Manifest entries to diff against for each window (in days):
+    the latest run with time_utc <= now - days, else the earliest run.
+    Returns {days: entry or None}; one manifest read for all windows."""
+    entries = load_index(snap_dir, site_id)
+    if not entries:
+        return {w: None for w in windows}
 
-def save_snapshot(snap_dir, site_id, snapshot):
+    now = datetime.now(timezone.utc)
+    times = [_parse_time(e["time_utc"]) for e in entries]
+    out = {}
+    for w in windows:
+        i = bisect_right(times, now - timedelta(days=float(w)))
+        # Fallback (history < days): use the earliest snapshot as baseline
+        out[w] = entries[i - 1] if i > 0 else entries[0]
+    return out
+
+def save_snapshot(snap_dir, site_id, snapshot, keyframe_every=24, codec="json"):
+    """Write a run. Every `keyframe_every` runs (or when most of the catalog
+    changed) the full product list is stored as a content-addressed object;
+    otherwise only the delta against the previous run. Payload objects are
+    written with `codec` (see codec.py). Returns the run file's name."""
     run_id = snapshot["run_id"]
-    fn = os.path.join(snap_dir, f"{site_id}__{run_id}.json")
-    write_json(fn, snapshot)
+    fname = f"{site_id}__{run_id}.json"
+    canonical = canonical_products(snapshot.get("products"))
+    h = _content_hash(canonical)
+    meta = {k: v for k, v in snapshot.items() if k != "products"}
+
+    entries = [e for e in load_index(snap_dir, site_id) if e["file"] != fname]
+    since_keyframe = 0
+    for e in reversed(entries):
+        if e.get("keyframe", True):
+            break
+        since_keyframe += 1
+
+    record = None
+    if entries and since_keyframe + 1 < int(keyframe_every) and _unique_keys(canonical):
+        base = entries[-1]["file"]
+        base_products = _state(snap_dir, base)
+        if _unique_keys(base_products):
+            delta = delta_products(base_products, canonical)
+            # Not worth it when the delta is about as big as the catalog itself
+            if len(json.dumps(delta, ensure_ascii=False)) <= len(json.dumps(canonical, ensure_ascii=False)) // 2:
+                delta_ref = _json_hash(delta)
+                _put_object(snap_dir, _delta_records(delta), delta_ref, codec)
+                record = dict(meta, base=base, delta_ref=delta_ref, product_count=len(canonical), content_hash=h)
+    if record is None:
+        record = _keyframe_record(snap_dir, meta, canonical, h, codec)
+    write_json(os.path.join(snap_dir, fname), record)
 
-def prune_snapshots(snap_dir, keep_per_site=40):
+    entries.append(_index_entry(fname, record))
+    _write_index(snap_dir, site_id, entries)
+    return fname
+
+def prune_snapshots(snap_dir, keep_per_site=40, codec="json", keep_days=0):
+    """Keep the newest `keep_per_site` runs per site, and never delete the
+    runs a `keep_days` baseline still needs (its baseline run and everything
+    after it), however many runs a day the site gets."""
     files = glob(os.path.join(snap_dir, "*.json"))
     by_site = {}
     for f in files:
@@ -96,10 +335,38 @@ def prune_snapshots(snap_dir, keep_per_site=40):
 
     for site_id, fs in by_site.items():
         fs_sorted = sorted(fs)
-        to_delete = fs_sorted[:-keep_per_site]
+        cut = max(0, len(fs_sorted) - keep_per_site) if keep_per_site > 0 else 0
+        if keep_days and cut:
+            oldest_needed = find_baselines(snap_dir, site_id, [keep_days])[keep_days]
+            if oldest_needed is not None:
+                names = [os.path.basename(f) for f in fs_sorted]
+                cut = min(cut, bisect_left(names, oldest_needed["file"]))
+        to_delete = fs_sorted[:cut]
+        if not to_delete:
+            continue
+        # The oldest kept run may be a delta on a run we are about to delete:
+        # turn it into a keyframe first so its chain stays intact.
+        first_kept = os.path.basename(fs_sorted[len(to_delete)])
+        record = _read_record(snap_dir, first_kept)
+        if _is_delta(record):
+            canonical = list(_state(snap_dir, first_kept))
+            write_json(os.path.join(snap_dir, first_kept),
+                       _keyframe_record(snap_dir, record, canonical, record["content_hash"], codec))
+            entries = load_index(snap_dir, site_id)
+            for e in entries:
+                if e["file"] == first_kept:
+                    e["keyframe"] = True
+                    e["ref"] = record["content_hash"]
+            _write_index(snap_dir, site_id, entries)
         for f in to_delete:
             try:
                 os.remove(f)
             except Exception:
                 pass
+        load_index(snap_dir, site_id)  # reconciles the manifest with what is left on disk
 
+    # Drop payload objects no remaining run points at
+    referenced = set()
+    for site_id in by_site:
+        referenced.update(e["ref"] for e in load_index(snap_dir, site_id) if e.get("ref"))
+    _gc_objects(snap_dir, referenced)
@@ -0,0 +1,214 @@
+"""Per-product price / stock history in SQLite (.cache/history.sqlite).
+
+Only changes are stored: a point is appended for a product when its price,
+availability or category differs from the last point (or it disappears), so
+the table grows with catalog churn rather than with the number of runs.
+
+    python src/timeseries.py backfill          # rebuild from docs/data/snapshots
+    python src/timeseries.py series brand_a shopify:some-handle --days 30
+
+The database is not committed: the workflow keeps it in the actions cache
+with the rest of .cache, and run.py rebuilds it from the snapshots if it
+is missing.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone, timedelta
+
+_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS points (
+    site_id   TEXT NOT NULL,
+    key       TEXT NOT NULL,
+    t         TEXT NOT NULL,
+    min_price REAL,
+    max_price REAL,
+    available INTEGER,
+    category  TEXT,
+    removed   INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (site_id, key, t)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS points_by_time ON points (site_id, t);
+CREATE INDEX IF NOT EXISTS points_by_category ON points (site_id, category, t);
+CREATE TABLE IF NOT EXISTS runs (
+    site_id TEXT NOT NULL,
+    t       TEXT NOT NULL,
+    run_id  TEXT,
+    PRIMARY KEY (site_id, t)
+) WITHOUT ROWID;
+"""
+
+
+def connect(db_path):
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _point(p):
+    avail = p.get("available")
+    return (p.get("min_price"), p.get("max_price"), None if avail is None else int(bool(avail)), p.get("category"))
+
+
+def _last_points(conn, site_id):
+    rows = conn.execute(
+        """
+        SELECT p.key, p.min_price, p.max_price, p.available, p.category, p.removed
+        FROM points p
+        JOIN (SELECT key, MAX(t) AS t FROM points WHERE site_id = ? GROUP BY key) last
+          ON p.key = last.key AND p.t = last.t
+        WHERE p.site_id = ?
+        """,
+        (site_id, site_id),
+    )
+    return {k: ((mn, mx, av, cat), removed) for k, mn, mx, av, cat, removed in rows}
+
+
+def append_run(db_path, site_id, time_utc, products, run_id=None):
+    """Record one run of a site; returns the number of points written."""
+    with _lock:
+        conn = connect(db_path)
+        try:
+            with conn:
+                last = _last_points(conn, site_id)
+                rows = []
+                seen = set()
+                for p in products or []:
+                    k = p.get("key")
+                    if not k or k in seen:
+                        continue
+                    seen.add(k)
+                    point = _point(p)
+                    prev = last.get(k)
+                    if prev is None or prev[1] or prev[0] != point:
+                        rows.append((site_id, k, time_utc, *point, 0))
+                for k, (point, removed) in last.items():
+                    if k not in seen and not removed:
+                        rows.append((site_id, k, time_utc, None, None, None, point[3], 1))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO points VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+                conn.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?)", (site_id, time_utc, run_id))
+            return len(rows)
+        finally:
+            conn.close()
+
+
+def _since(days):
+    return (datetime.now(timezone.utc) - timedelta(days=float(days))).replace(microsecond=0).isoformat()
+
+
+# Columns _range_rows may filter points on
+_FILTER_COLUMNS = ("site_id", "key", "category")
+
+
+def _range_rows(conn, filters, since, until):
+    """filters: ((column, value), ...) ANDed together, columns from _FILTER_COLUMNS."""
+    for col, _ in filters:
+        if col not in _FILTER_COLUMNS:
+            raise ValueError(f"cannot filter points on {col!r}")
+    where = " AND ".join(f"{col} = ?" for col, _ in filters)
+    where_p = " AND ".join(f"p.{col} = ?" for col, _ in filters)
+    args = tuple(v for _, v in filters)
+    # The state at `since` (last point before it) plus every point inside the range
+    sql = f"""
+        SELECT key, t, min_price, max_price, available, removed FROM points
+        WHERE {where} AND t > ? AND t <= ?
+        UNION ALL
+        SELECT p.key, p.t, p.min_price, p.max_price, p.available, p.removed
+        FROM points p
+        JOIN (SELECT key, MAX(t) AS t FROM points WHERE {where} AND t <= ? GROUP BY key) b
+          ON p.key = b.key AND p.t = b.t
+        WHERE {where_p}
+        ORDER BY 1, 2
+    """
+    return conn.execute(sql, (*args, since, until, *args, since, *args))
+
+
+def series(db_path, site_id, key, since=None, until=None):
+    """[(t, min_price, max_price, available, removed), ...] for one product."""
+    since = since or _since(30)
+    until = until or "9999"
+    conn = connect(db_path)
+    try:
+        return [r[1:] for r in _range_rows(conn, (("site_id", site_id), ("key", key)), since, until)]
+    finally:
+        conn.close()
+
+
+def category_series(db_path, site_id, category, since=None, until=None):
+    """{key: [(t, min_price, max_price, available, removed), ...]} for one category."""
+    since = since or _since(30)
+    until = until or "9999"
+    out = {}
+    conn = connect(db_path)
+    try:
+        for k, *rest in _range_rows(conn, (("site_id", site_id), ("category", category)), since, until):
+            out.setdefault(k, []).append(tuple(rest))
+    finally:
+        conn.close()
+    return out
+
+
+def sparklines(db_path, site_id, days=30):
+    """Compact per-product series for the dashboard, only for products that
+    actually moved in the `days` before the site's latest run:
+    {key: [[t, min_price, available], ...]}."""
+    out = {}
+    conn = connect(db_path)
+    try:
+        (latest,) = conn.execute("SELECT MAX(t) FROM runs WHERE site_id = ?", (site_id,)).fetchone()
+        if not latest:
+            return {}
+        since = (datetime.fromisoformat(latest) - timedelta(days=float(days))).isoformat()
+        rows = _range_rows(conn, (("site_id", site_id),), since, latest)
+        for k, t, mn, _mx, av, removed in rows:
+            if removed:
+                continue
+            out.setdefault(k, []).append([t[:16], mn, av])
+    finally:
+        conn.close()
+    return {k: pts for k, pts in out.items() if len(pts) > 1}
+
+
+def backfill(db_path, snap_dir):
+    """Rebuild the store from every snapshot on disk (oldest first)."""
+    from storage import load_index, load_run
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    sites = sorted({fn.split("__", 1)[0] for fn in os.listdir(snap_dir) if fn.endswith(".json") and "__" in fn})
+    for site_id in sites:
+        n = 0
+        for e in load_index(snap_dir, site_id):
+            snap = load_run(snap_dir, e["file"])
+            n += append_run(db_path, site_id, snap["time_utc"], snap.get("products"), run_id=snap.get("run_id"))
+        print(f"  {site_id}: {n} points")
+
+
+def main():
+    from run import HISTORY_DB, SNAP_DIR
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", default=HISTORY_DB)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("backfill")
+    q = sub.add_parser("series")
+    q.add_argument("site_id")
+    q.add_argument("key")
+    q.add_argument("--days", type=float, default=30)
+    args = ap.parse_args()
+
+    if args.cmd == "backfill":
+        backfill(args.db, SNAP_DIR)
+    else:
+        print(json.dumps(series(args.db, args.site_id, args.key, since=_since(args.days)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
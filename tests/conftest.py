@@ -0,0 +1,69 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+
+def _product(i, **fields):
+    p = {
+        "key": f"shopify:item-{i:04d}",
+        "title": f"Item {i}",
+        "variant_label": "",
+        "min_price": float(10 + i),
+        "max_price": float(10 + i),
+        "available": True,
+        "category": "Rings" if i % 2 else "Earrings",
+        "product_url": f"https://shop.test/products/item-{i:04d}",
+    }
+    p.update(fields)
+    return p
+
+
+@pytest.fixture
+def product():
+    """product(i, **fields): one normalised product with a stable key."""
+    return _product
+
+
+@pytest.fixture
+def snapshot():
+    """snapshot(site_id, products, hours_ago=0): a run as _run_site hands it to save_snapshot."""
+    def make(site_id, products, hours_ago=0):
+        t = (datetime.now(timezone.utc) - timedelta(hours=hours_ago)).replace(microsecond=0)
+        return {
+            "site_id": site_id,
+            "name": site_id,
+            "base_url": "https://shop.test",
+            "run_id": t.isoformat().replace(":", "-"),
+            "time_utc": t.isoformat(),
+            "products": products,
+            "meta": {},
+            "bestsellers": [],
+        }
+    return make
+
+
+@pytest.fixture
+def storefront():
+    """storefront(skus, **StandinStore kwargs) -> (store, site config) on a local stand-in server."""
+    from standin import StandinStore, serve
+    from synth import CATEGORIES, make_catalog
+
+    servers = []
+
+    def start(skus=60, seed=0, **kw):
+        store = StandinStore(make_catalog(skus, variants=1, seed=seed), seed=seed, **kw)
+        srv = serve(store)
+        servers.append(srv)
+        site = {"id": f"site{len(servers)}", "base_url": srv.url,
+                "categories": [{"label": c, "url": f"{srv.url}/collections/{c.lower()}"} for c in CATEGORIES]}
+        return store, site
+
+    yield start
+    for srv in servers:
+        srv.shutdown()
@@ -0,0 +1,87 @@
+import json
+import os
+import time
+
+import pytest
+import requests
+
+from fetchers import shopify
+from fetchers.cache import CrawlCheckpoint
+from fetchers.shopify import try_fetch_shopify
+from fetchers.transport import HttpClient
+
+CFG = {"schedule": {"max_products_per_site": 5000}, "shopify": {"page_retries": 2}}
+
+
+class Flaky:
+    """HttpClient whose listing pages fail with `exc` from call `fail_from` on, `times` times."""
+
+    def __init__(self, fail_from, times=10 ** 6, exc=requests.ConnectionError):
+        self.http = HttpClient()
+        self.calls = 0
+        self.fail_from, self.times, self.exc = fail_from, times, exc
+
+    def get_cached(self, *args, **kwargs):
+        self.calls += 1
+        if self.calls > self.fail_from and self.times > 0:
+            self.times -= 1
+            raise self.exc("boom")
+        return self.http.get_cached(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+
+def _canon(products):
+    return sorted((p["key"], p["min_price"], p["available"], p["category"]) for p in products)
+
+
+def test_checkpoint_round_trip_and_invalidation(tmp_path):
+    path = str(tmp_path / "s.json")
+    ck = CrawlCheckpoint(path)
+    assert not ck.resumed and ck.listing("Rings") is None
+    ck.save("Rings", [{"key": "a"}], 2)
+
+    again = CrawlCheckpoint(path)
+    assert again.resumed and again.listing("Rings") == {"products": [{"key": "a"}], "pages": 2, "status": None}
+    assert CrawlCheckpoint(path, mode="incremental").listing("Rings") is None
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    data["t"] = time.time() - 2 * 3600
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    assert CrawlCheckpoint(path, max_age_hours=1).listing("Rings") is None
+
+    again.clear()
+    assert not os.path.exists(path)
+
+
+def test_failed_crawl_resumes_from_checkpoint(storefront, tmp_path):
+    _, site = storefront(1200)
+    ref = try_fetch_shopify(site, CFG, http=HttpClient())
+
+    with pytest.raises(requests.ConnectionError):
+        try_fetch_shopify(site, CFG, http=Flaky(fail_from=5), checkpoint_dir=str(tmp_path))
+    assert os.path.exists(tmp_path / f"{site['id']}.json")
+
+    out = try_fetch_shopify(site, CFG, http=HttpClient(), checkpoint_dir=str(tmp_path))
+
+    assert out["meta"]["incremental"]["resumed"]
+    assert out["meta"]["incremental"]["pages"] < ref["meta"]["incremental"]["pages"]
+    assert _canon(out["products"]) == _canon(ref["products"])
+    assert not os.path.exists(tmp_path / f"{site['id']}.json")
+
+
+def test_broken_page_is_retried_on_its_own(storefront, monkeypatch):
+    monkeypatch.setattr(shopify, "backoff_delay", lambda attempt: 0)
+    _, site = storefront(600)
+    ref = try_fetch_shopify(site, CFG, http=HttpClient())
+
+    flaky = Flaky(fail_from=2, times=2, exc=requests.exceptions.ChunkedEncodingError)
+    out = try_fetch_shopify(site, CFG, http=flaky)
+
+    assert _canon(out["products"]) == _canon(ref["products"])
+    # connection errors were already retried by HttpClient: not again per page
+    with pytest.raises(requests.ConnectionError):
+        try_fetch_shopify(site, CFG, http=Flaky(fail_from=2, times=1))
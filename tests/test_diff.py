@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from diff import diff_multi_sorted, diff_snapshots, diff_sorted, merge_diff
+from storage import canonical_products
+
+
+def _catalogs(product, seed, n=200):
+    rng = random.Random(seed)
+    prev = [product(i, available=rng.random() > 0.2) for i in range(n)]
+    cur = []
+    for p in prev:
+        roll = rng.random()
+        if roll < 0.1:
+            continue  # removed
+        p = dict(p)
+        if roll < 0.3:
+            p["min_price"] += rng.choice([-1, 1])
+        if roll > 0.8:
+            p["available"] = not p["available"]
+        cur.append(p)
+    cur += [product(n + i) for i in range(rng.randint(0, 15))]
+    rng.shuffle(prev)
+    rng.shuffle(cur)
+    return prev, cur
+
+
+def _key(c):
+    return (c["type"], c["key"])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_merge_diff_matches_indexed_diff(product, seed):
+    prev, cur = _catalogs(product, seed)
+    want_changes, want_counts = diff_snapshots(prev, cur)
+
+    counts = {"new": 0, "removed": 0, "price": 0, "restock": 0, "oos": 0}
+    got = list(merge_diff(canonical_products(prev), canonical_products(cur), counts))
+
+    assert counts == want_counts
+    assert sorted(got, key=_key) == sorted(want_changes, key=_key)
+
+
+def test_merge_diff_later_duplicate_wins(product):
+    prev = [product(1), product(1, min_price=99.0)]
+    cur = [product(1, min_price=99.0)]
+    counts = {"new": 0, "removed": 0, "price": 0, "restock": 0, "oos": 0}
+    assert list(merge_diff(prev, cur, counts)) == diff_snapshots(prev, cur)[0] == []
+
+
+@pytest.mark.parametrize("buffer", [7, 20000])
+def test_diff_sorted_spills_and_keeps_display_order(product, buffer):
+    prev, cur = _catalogs(product, 42)
+    changes, counts = diff_sorted(canonical_products(prev), canonical_products(cur), max_in_memory=buffer)
+    want_changes, want_counts = diff_snapshots(prev, cur)
+
+    assert counts == want_counts
+    # same records in the same type/title order as the in-memory diff
+    assert [(c["type"], c["title"]) for c in changes] == [(c["type"], c["title"]) for c in want_changes]
+    assert sorted(changes, key=_key) == sorted(want_changes, key=_key)
+
+
+def test_diff_multi_sorted_builds_change_lists_only_for_full_windows(product):
+    prev1, cur = _catalogs(product, 1)
+    prev7, _ = _catalogs(product, 7)
+    cur = canonical_products(cur)
+    baselines = {"1d": iter(canonical_products(prev1)), "7d": iter(canonical_products(prev7)), None: []}
+
+    diffs = diff_multi_sorted(cur, baselines, full={"1d"})
+
+    assert sorted(diffs["1d"][0], key=_key) == sorted(diff_snapshots(prev1, cur)[0], key=_key)
+    assert diffs["7d"] == (None, diff_snapshots(prev7, cur)[1])
+    assert diffs[None] == (None, {"new": len(cur), "removed": 0, "price": 0, "restock": 0, "oos": 0})
@@ -0,0 +1,45 @@
+import time
+
+from fetchers.generic import fetch_generic_catalog, make_parse_pool
+from fetchers.transport import HttpClient
+
+
+def _keys(result):
+    return {p["key"] for p in result["products"]}
+
+
+def test_deadline_carries_unfetched_products_forward(storefront):
+    _, site = storefront(120, mode="generic", latency_ms=10)
+    full = fetch_generic_catalog(site, {"generic": {"io_workers": 4}}, http=HttpClient())
+    assert len(full["products"]) == 120 and "deadline_hit" not in full["meta"]
+
+    cut = fetch_generic_catalog(site, {"generic": {"io_workers": 2, "deadline_sec": 0.3}}, http=HttpClient(),
+                                previous=full)
+
+    assert cut["meta"]["deadline_hit"] and cut["meta"]["carried_forward"] > 0
+    assert _keys(cut) == _keys(full)
+
+
+def test_slow_pages_do_not_overshoot_the_deadline(storefront):
+    store, site = storefront(20, mode="generic")
+    store.latency = 2.0
+    cfg = {"generic": {"io_workers": 4, "deadline_sec": 0.5}, "schedule": {"request_timeout_sec": 20}}
+
+    t0 = time.monotonic()
+    out = fetch_generic_catalog(site, cfg, http=HttpClient())
+
+    assert time.monotonic() - t0 < 1.5
+    assert out["meta"]["deadline_hit"]
+
+
+def test_shared_parse_pool_matches_inline_parsing(storefront):
+    _, site = storefront(40, mode="generic")
+    cfg = {"generic": {"io_workers": 4, "parse_workers": 2}}
+    inline = fetch_generic_catalog(site, cfg, http=HttpClient())
+    pool = make_parse_pool(cfg)
+    try:
+        runs = [fetch_generic_catalog(site, cfg, http=HttpClient(), parse_pool=pool) for _ in range(2)]
+    finally:
+        pool.shutdown()
+    for out in runs:
+        assert sorted(out["products"], key=lambda p: p["key"]) == sorted(inline["products"], key=lambda p: p["key"])
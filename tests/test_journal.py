@@ -0,0 +1,36 @@
+import json
+import os
+from datetime import datetime, timezone
+
+from journal import append_changes, feed, prune, query
+
+NOW = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+
+def _append(journal_dir, site_id, day, types):
+    append_changes(journal_dir, site_id, "r", f"{day}T08:00:00+00:00", [{"type": t, "key": f"k{i}"} for i, t in enumerate(types)])
+
+
+def test_query_filters_by_type_and_site(tmp_path):
+    d = str(tmp_path)
+    _append(d, "a", "2026-10-15", ["PRICE", "NEW"])
+    _append(d, "b", "2026-10-16", ["PRICE"])
+    _append(d, "a", "2026-09-01", ["PRICE"])
+
+    assert [r["site_id"] for r in query(d, days=14, types={"PRICE"}, now=NOW)] == ["a", "b"]
+    assert [r["type"] for r in query(d, days=14, site_id="a", now=NOW)] == ["PRICE", "NEW"]
+    out = feed(d, days=14, now=NOW)
+    assert out["total"] == 3 and sorted(out["by_day"]) == ["2026-10-15", "2026-10-16"]
+
+
+def test_prune_drops_old_days_and_their_index_entries(tmp_path):
+    d = str(tmp_path)
+    for day in ("2026-08-01", "2026-09-16", "2026-10-10"):
+        _append(d, "a", day, ["PRICE"])
+
+    assert prune(d, keep_days=30, now=NOW) == ["2026-08-01", "2026-09-16"]
+
+    assert sorted(os.listdir(d)) == ["2026-10-10.jsonl", "index.json"]
+    with open(os.path.join(d, "index.json"), encoding="utf-8") as f:
+        assert list(json.load(f)) == ["2026-10-10"]
+    assert prune(d, keep_days=30, now=NOW) == []
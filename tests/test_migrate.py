@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+import migrate as migrate_mod
+from migrate import migrate
+from storage import canonical_products, load_index, load_run, save_snapshot
+
+
+@pytest.fixture
+def legacy_tree(tmp_path, product, snapshot):
+    """A json-codec snapshot tree with two sites; returns (snap_dir, {file: products})."""
+    snap_dir = str(tmp_path / "snapshots")
+    want = {}
+    for site_id in ("a", "b"):
+        for r in range(6):
+            products = [product(i, min_price=float(i + r)) for i in range(8 + r)]
+            fname = save_snapshot(snap_dir, site_id, snapshot(site_id, products, hours_ago=12 - r), keyframe_every=3)
+            want[fname] = canonical_products(products)
+    return snap_dir, want
+
+
+def test_migrate_rewrites_every_run_in_the_new_codec(legacy_tree):
+    snap_dir, want = legacy_tree
+
+    assert migrate(snap_dir, "jsonl.gz", 24) == []
+
+    assert not os.path.exists(snap_dir + ".old") and not os.path.exists(snap_dir + ".migrate")
+    assert sorted(e["file"] for s in ("a", "b") for e in load_index(snap_dir, s)) == sorted(want)
+    for fname, products in want.items():
+        assert load_run(snap_dir, fname)["products"] == products
+    objects = [fn for _, _, fns in os.walk(os.path.join(snap_dir, "objects")) for fn in fns]
+    assert objects and all(fn.endswith(".jsonl.gz") for fn in objects)
+
+
+def test_migrate_keeps_old_tree_when_runs_are_skipped(legacy_tree, capsys):
+    snap_dir, want = legacy_tree
+    with open(os.path.join(snap_dir, "a__broken.json"), "w", encoding="utf-8") as f:
+        f.write("{not json")
+
+    skipped = migrate(snap_dir, "jsonl.gz", 24)
+
+    assert skipped == ["a__broken.json"]
+    assert os.path.exists(os.path.join(snap_dir + ".old", "a__broken.json"))
+    assert "a__broken.json" in capsys.readouterr().out
+    for fname, products in want.items():
+        assert load_run(snap_dir, fname)["products"] == products
+
+
+def test_migrate_leaves_source_untouched_on_mismatch(legacy_tree, monkeypatch):
+    snap_dir, want = legacy_tree
+    before = sorted(os.listdir(snap_dir))
+    real = migrate_mod.save_snapshot
+
+    def lossy(snap_dir_, site_id, snap, **kw):
+        snap = dict(snap, products=snap["products"][:-1])
+        return real(snap_dir_, site_id, snap, **kw)
+
+    monkeypatch.setattr(migrate_mod, "save_snapshot", lossy)
+    with pytest.raises(SystemExit, match="Migration check failed"):
+        migrate(snap_dir, "jsonl.gz", 24)
+
+    assert sorted(os.listdir(snap_dir)) == before
+    assert os.path.isdir(snap_dir + ".migrate")
+    for fname, products in want.items():
+        assert load_run(snap_dir, fname)["products"] == products
@@ -0,0 +1,106 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from fetchers.ratelimit import HostRateLimiter, TokenBucket, retry_after_seconds
+from fetchers.transport import HostThrottled, HttpClient
+
+
+def test_retry_after_seconds():
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert retry_after_seconds("30") == 30.0
+    assert retry_after_seconds(format_datetime(now + timedelta(seconds=90), usegmt=True), now=now) == 90.0
+    assert retry_after_seconds(format_datetime(now - timedelta(seconds=5), usegmt=True), now=now) == 0.0
+    assert retry_after_seconds("soon") is None
+    assert retry_after_seconds(None) is None
+
+
+def test_token_bucket_spaces_callers_evenly():
+    b = TokenBucket(rate=10, burst=2)
+    now = b.stamp
+    waits = [b.reserve(now) for _ in range(5)]
+    assert waits == pytest.approx([0.0, 0.0, 0.1, 0.2, 0.3])
+    assert TokenBucket(rate=0).reserve(now) == 0.0
+
+
+def test_throttle_pauses_halves_and_recovers():
+    lim = HostRateLimiter(rate=4, burst=1)
+    lim.acquire("h")
+    lim.throttled("h", 30)
+    assert lim.stats()["h"]["rate_per_sec"] == 2.0
+    assert lim.stats()["h"]["throttled"] == 1
+    # a pause longer than the caller accepts is reported instead of slept
+    assert lim.acquire("h", max_pause=5) == pytest.approx(30, abs=1)
+    for _ in range(20):
+        lim.succeeded("h")
+    assert lim.stats()["h"]["rate_per_sec"] == 4.0
+
+
+@pytest.fixture
+def server():
+    """Local server answering from `script`: a list of (status, headers, delay_s); the last entry repeats."""
+    state = {"script": [(200, {}, 0)], "hits": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            i = min(state["hits"], len(state["script"]) - 1)
+            state["hits"] += 1
+            status, headers, delay = state["script"][i]
+            time.sleep(delay)
+            body = b"{}"
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{srv.server_address[1]}/x"
+    yield state
+    srv.shutdown()
+
+
+def test_retries_after_retry_after_and_throttles_host(server):
+    server["script"] = [(503, {"Retry-After": "0"}, 0), (429, {"Retry-After": "0"}, 0), (200, {}, 0)]
+    http = HttpClient(max_retries=3)
+
+    assert http.get(server["url"]).status_code == 200
+
+    stats = http.host_stats()["127.0.0.1"]
+    assert server["hits"] == 3
+    assert stats["retries"] == 2 and stats["throttled"] == 2
+
+
+def test_long_retry_after_pauses_host_and_raises(server):
+    server["script"] = [(429, {"Retry-After": "600"}, 0)]
+    http = HttpClient(max_retries=3, retry_after_max=5)
+
+    with pytest.raises(HostThrottled) as e:
+        http.get(server["url"])
+    assert e.value.wait == 600 and e.value.response.status_code == 429
+    # the host stays paused: the next request fails fast without reaching the server
+    with pytest.raises(HostThrottled):
+        http.get(server["url"])
+    assert server["hits"] == 1
+
+
+
+def test_deadline_bounds_attempts_and_retries(server):
+    server["script"] = [(200, {}, 2)]
+    http = HttpClient(max_retries=3, backoff_base=0.01)
+
+    t0 = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        http.get(server["url"], timeout=20, deadline=time.monotonic() + 0.3)
+    assert time.monotonic() - t0 < 1.0
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+
+from journal import append_changes
+from scheduler import DEFAULTS, change_rates, due_sites, next_interval, update_state
+
+NOW = datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc)
+SC = dict(DEFAULTS)
+
+
+def test_next_interval_backs_off_and_recovers():
+    site = {"id": "s"}
+    assert next_interval(site, SC, None, 0.0, 0) == 2.0
+    assert next_interval(site, SC, 2.0, 0.0, 0) == 4.0
+    assert next_interval(site, SC, 16.0, 0.0, 0) == 24.0  # capped at max_interval_hours
+    # changes: back down to the rate target or prev / backoff, whichever is shorter
+    assert next_interval(site, SC, 24.0, 1.0, 5) == 12.0
+    assert next_interval(site, SC, 24.0, 100.0, 5) == 2.0  # never below min_interval_hours
+    assert next_interval({"id": "s", "max_interval_hours": 6}, SC, 6.0, 0.0, 0) == 6.0
+
+
+def test_due_sites_respects_interval_and_grace():
+    sites = [{"id": "new"}, {"id": "due"}, {"id": "early"}, {"id": "grace"}]
+    state = {
+        "due": {"last_run_utc": (NOW - timedelta(hours=5)).isoformat(), "interval_hours": 4},
+        "early": {"last_run_utc": (NOW - timedelta(hours=2)).isoformat(), "interval_hours": 4},
+        "grace": {"last_run_utc": (NOW - timedelta(hours=3.6)).isoformat(), "interval_hours": 4},
+    }
+    due, skipped = due_sites(sites, state, SC, now=NOW)
+    assert [s["id"] for s in due] == ["new", "due", "grace"]
+    assert [s["id"] for s in skipped] == ["early"]
+    assert due_sites(sites, state, dict(SC, enabled=False), now=NOW)[0] == sites
+
+
+def test_update_state_uses_journal_rate(tmp_path):
+    journal_dir = str(tmp_path)
+    day = (NOW - timedelta(days=1)).isoformat()
+    append_changes(journal_dir, "busy", "r1", day, [{"type": "PRICE", "key": f"k{i}"} for i in range(14)])
+    assert change_rates(journal_dir, 7, NOW) == {"busy": 2.0}
+
+    sites = [{"id": "busy"}, {"id": "quiet"}, {"id": "broken"}]
+    state = {"busy": {"interval_hours": 24}, "quiet": {"interval_hours": 4},
+             "broken": {"interval_hours": 24, "rate_per_day": 1.5, "last_ok_utc": "2026-03-01T00:00:00+00:00"}}
+    results = {"busy": {"status": "ok", "run_change_total": 3},
+               "quiet": {"status": "ok", "run_change_total": 0},
+               "broken": {"status": "error"}}
+
+    update_state(state, sites, results, SC, journal_dir, now=NOW)
+
+    assert state["busy"]["interval_hours"] == 8.0 and state["busy"]["rate_per_day"] == 2.0
+    assert state["quiet"]["interval_hours"] == 8.0
+    assert state["broken"]["interval_hours"] == 2.0
+    assert state["broken"]["last_ok_utc"] == "2026-03-01T00:00:00+00:00"
+    assert state["busy"]["last_ok_utc"] == state["busy"]["last_run_utc"] == NOW.isoformat()
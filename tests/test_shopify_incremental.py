@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+
+from fetchers.shopify import try_fetch_shopify
+from fetchers.transport import HttpClient
+from synth import CATEGORIES
+
+CFG = {"schedule": {"max_products_per_site": 5000}, "shopify": {"incremental": True, "full_sweep_hours": 24}}
+
+
+def _crawl(site, previous=None, cfg=CFG):
+    return try_fetch_shopify(site, cfg, http=HttpClient(), previous=previous)
+
+
+def _canon(products):
+    return sorted((p["key"], p["min_price"], p["available"], p["category"]) for p in products)
+
+
+def _touch(catalog, n):
+    """Reprice the first n products and bump their updated_at to now."""
+    now = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+    out = [dict(p, variants=[dict(v) for v in p["variants"]]) for p in catalog]
+    for p in out[:n]:
+        p["variants"][0]["price"] = "999.00"
+        p["updated_at"] = now
+    return out
+
+
+def test_incremental_crawl_stops_at_the_watermark(storefront):
+    store, site = storefront(1600)
+    full = _crawl(site)
+    assert full["meta"]["incremental"]["mode"] == "full"
+
+    store.set_catalog(_touch(store.catalog, 6))
+    inc = _crawl(site, previous=full)
+
+    meta = inc["meta"]["incremental"]
+    assert meta["mode"] == "incremental"
+    assert sorted(meta["early_exit"]) == sorted(CATEGORIES)
+    # one page per listing instead of walking each to its end
+    assert meta["pages"] == len(CATEGORIES) < full["meta"]["incremental"]["pages"]
+    assert _canon(inc["products"]) == _canon(_crawl(site)["products"])
+
+
+def test_unordered_listings_are_crawled_in_full(storefront):
+    store, site = storefront(1600, order="random")
+    full = _crawl(site)
+    store.set_catalog(_touch(store.catalog, 6))
+
+    inc = _crawl(site, previous=full)
+
+    meta = inc["meta"]["incremental"]
+    assert meta["early_exit"] == [] and sorted(meta["unordered"]) == sorted(CATEGORIES)
+    assert _canon(inc["products"]) == _canon(_crawl(site)["products"])
+
+
+def test_stale_full_sweep_forces_a_full_crawl(storefront):
+    _, site = storefront(400)
+    full = _crawl(site)
+    full["meta"]["incremental"]["last_full_sweep_utc"] = \
+        (datetime.now(timezone.utc) - timedelta(hours=25)).isoformat()
+
+    assert _crawl(site, previous=full)["meta"]["incremental"]["mode"] == "full"
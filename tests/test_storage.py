@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from storage import (canonical_products, find_baselines, iter_snapshot_products, load_index, load_run,
+                     prune_snapshots, save_snapshot)
+
+
+def _history(product, snapshot, runs, hours_apart=2):
+    """`runs` catalogs where each run reprices, drops and adds a few products."""
+    out = []
+    items = {i: product(i) for i in range(30)}
+    for r in range(runs):
+        items[r % 30] = dict(items[r % 30], min_price=items[r % 30]["min_price"] + 1)
+        items.pop(r + 197, None)
+        items[r + 200] = product(r + 200)
+        if r % 3 == 0:
+            items[(r * 5) % 30] = dict(items[(r * 5) % 30], available=not items[(r * 5) % 30]["available"])
+        out.append(snapshot("s", list(items.values()), hours_ago=(runs - r) * hours_apart))
+    return out
+
+
+@pytest.mark.parametrize("codec", ["json", "jsonl.gz"])
+def test_round_trip_through_keyframes_and_deltas(tmp_path, product, snapshot, codec):
+    snaps = _history(product, snapshot, 10)
+    files = [save_snapshot(str(tmp_path), "s", s, keyframe_every=4, codec=codec) for s in snaps]
+
+    entries = load_index(str(tmp_path), "s")
+    assert [e["file"] for e in entries] == files
+    assert any(e["keyframe"] for e in entries) and not all(e["keyframe"] for e in entries)
+    for s, fname in zip(snaps, files):
+        want = canonical_products(s["products"])
+        assert load_run(str(tmp_path), fname)["products"] == want
+        assert list(iter_snapshot_products(str(tmp_path), fname)) == want
+
+
+def test_duplicate_keys_are_stored_whole(tmp_path, product, snapshot):
+    dup = [product(1), product(1, title="Item 1 again"), product(2)]
+    save_snapshot(str(tmp_path), "s", snapshot("s", [product(1)], hours_ago=2))
+    fname = save_snapshot(str(tmp_path), "s", snapshot("s", dup, hours_ago=1))
+    assert sorted(p["title"] for p in load_run(str(tmp_path), fname)["products"]) == \
+        sorted(p["title"] for p in dup)
+
+
+def test_prune_keeps_newest_runs_readable(tmp_path, product, snapshot):
+    snaps = _history(product, snapshot, 12)
+    files = [save_snapshot(str(tmp_path), "s", s, keyframe_every=5, codec="jsonl.gz") for s in snaps]
+
+    prune_snapshots(str(tmp_path), keep_per_site=4, codec="jsonl.gz")
+
+    entries = load_index(str(tmp_path), "s")
+    assert [e["file"] for e in entries] == files[-4:]
+    # the oldest kept run was a delta on a deleted run; it must still rebuild
+    for s, fname in zip(snaps[-4:], files[-4:]):
+        assert list(iter_snapshot_products(str(tmp_path), fname)) == canonical_products(s["products"])
+    assert sorted(fn for fn in os.listdir(tmp_path) if fn.endswith(".json")) == sorted(files[-4:])
+    refs = {e["ref"] for e in entries if e.get("ref")}
+    objects = {fn.split(".", 1)[0] for _, _, fns in os.walk(tmp_path / "objects") for fn in fns}
+    assert refs <= objects
+
+
+def test_prune_keeps_what_the_longest_window_needs(tmp_path, product, snapshot):
+    # 12 runs a day for 4 days: keep_per_site alone would cut into the 3-day window
+    snaps = [snapshot("s", [product(i, min_price=float(i + r)) for i in range(5)], hours_ago=96 - 2 * r)
+             for r in range(48)]
+    for s in snaps:
+        save_snapshot(str(tmp_path), "s", s, keyframe_every=24)
+    baseline = find_baselines(str(tmp_path), "s", [3])[3]
+
+    prune_snapshots(str(tmp_path), keep_per_site=10, keep_days=3)
+
+    entries = load_index(str(tmp_path), "s")
+    assert entries[0]["file"] == baseline["file"]
+    assert find_baselines(str(tmp_path), "s", [3])[3]["file"] == baseline["file"]
+    assert len(entries) > 10